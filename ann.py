@@ -0,0 +1,202 @@
+"""Approximate nearest-neighbor search for catalogs too large for exact search.
+
+`IVFIndex` is an inverted-file index: spherical k-means splits the catalog
+into `n_lists` clusters, and a query only scores the movies in the `n_probe`
+clusters whose centroids are closest to it. `n_lists` and `n_probe` trade
+recall against latency; run this module to measure recall@K against exact
+search on a built artifact version:
+
+    python ann.py --artifacts artifacts/<version> --n-lists 128 --n-probe 1 2 4 8 16
+
+`--save` keeps the trained index: it is written into a copy of the version,
+published as a new version if the base was the served one (a published
+version never changes).
+
+Like NeighborIndex, an IVFIndex answers `neighbors(row, k)`, so app.py can use
+either one (NEIGHBOR_BACKEND=exact|ivf).
+"""
+import argparse
+import os
+import shutil
+import time
+
+import numpy as np
+from scipy import sparse
+
+import artifacts
+from artifacts import load_array, load_csr, save_array
+from neighbors import load_neighbor_index, top_k
+
+
+def _assign(vectors, centroids, block_size=4096):
+    """Closest centroid for every row, scored one row block at a time"""
+    assignments = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], block_size):
+        scores = vectors[start:start + block_size] @ centroids.T
+        assignments[start:start + block_size] = np.asarray(scores).argmax(axis=1)
+    return assignments
+
+
+def train_ivf(vectors, n_lists=None, iterations=10, seed=0):
+    """Spherical k-means over normalized rows; returns (centroids, assignments)"""
+    n = vectors.shape[0]
+    n_lists = min(n_lists or max(1, int(np.sqrt(n))), n)
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(n, n_lists, replace=False)].toarray()
+
+    for _ in range(iterations):
+        assignments = _assign(vectors, centroids)
+        members = sparse.csr_matrix(
+            (np.ones(n, dtype=np.float32), (assignments, np.arange(n))), shape=(n_lists, n)
+        )
+        centroids = np.asarray((members @ vectors).todense(), dtype=np.float32)
+        norms = np.linalg.norm(centroids, axis=1)
+        empty = norms == 0
+        # Re-seed empty clusters from random movies
+        centroids[empty] = vectors[rng.choice(n, int(empty.sum()), replace=False)].toarray()
+        norms[empty] = 1
+        centroids /= norms[:, None]
+
+    return centroids, _assign(vectors, centroids)
+
+
+class IVFIndex:
+    """Inverted-file ANN index over L2-normalized sparse vectors"""
+
+    def __init__(self, vectors, centroids, assignments, n_probe=8):
+        self.vectors = vectors
+        self.centroids = centroids
+        self.n_probe = n_probe
+        # Rows grouped by cluster: list i is order[offsets[i]:offsets[i + 1]]
+        self.order = np.argsort(assignments, kind='stable').astype(np.int32)
+        self.offsets = np.searchsorted(assignments[self.order], np.arange(len(centroids) + 1))
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    def search(self, query, k, exclude=None):
+        """Approximate top-k rows for a normalized 1 x F query vector"""
+        centroid_scores = np.asarray(query @ self.centroids.T).ravel()
+        probe, _ = top_k(centroid_scores, self.n_probe)
+        candidates = np.concatenate([self.order[self.offsets[i]:self.offsets[i + 1]] for i in probe])
+        scores = np.asarray((self.vectors[candidates] @ query.T).todense()).ravel()
+        if exclude is not None:
+            scores[candidates == exclude] = -np.inf
+        best, best_scores = top_k(scores, k)
+        keep = np.isfinite(best_scores)
+        return candidates[best][keep], best_scores[keep]
+
+    def neighbors(self, row, k=5):
+        """Return the (rows, scores) of the approximate k nearest neighbors of a movie row"""
+        return self.search(self.vectors[row], k, exclude=row)
+
+
+class ExactSearch:
+    """Brute-force cosine search over every movie, the reference for recall"""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def neighbors(self, row, k=5):
+        scores = np.asarray((self.vectors @ self.vectors[row].T).todense()).ravel()
+        return top_k(scores, k, exclude=row)
+
+
+def save_ivf(path, centroids, assignments):
+    save_array(path, 'ivf_centroids', centroids)
+    save_array(path, 'ivf_assignments', assignments)
+
+
+def save_ivf_version(base_path, centroids, assignments, params=None, publish=True):
+    """New artifact version next to `base_path` with these IVF arrays; returns its path.
+
+    Published if `publish` and the base is the served version, so the app
+    switches over atomically like after any build.
+    """
+    root, base_version = os.path.split(os.path.normpath(base_path))
+    version = artifacts.new_version()
+    path = artifacts.version_dir(root, version)
+    # Published files are never rewritten, so hard links are as good as copies;
+    # the files written below are left out rather than linked and then overwritten
+    shutil.copytree(base_path, path, ignore=shutil.ignore_patterns('ivf_*', artifacts.MANIFEST_FILE),
+                    copy_function=_link_or_copy)
+    save_ivf(path, centroids, assignments)
+    manifest = artifacts.read_manifest(base_path)
+    manifest.update({'version': version, 'base_version': base_version, 'ivf': params or {}})
+    artifacts.write_manifest(path, manifest)
+    if publish and artifacts.current_version(root) == base_version:
+        artifacts.publish(root, version)
+    return path
+
+
+def _link_or_copy(source, destination):
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def load_ivf(artifact_dir, n_probe=8):
+    """IVFIndex over an artifact version's (already normalized) tfidf and ivf arrays"""
+    return IVFIndex(load_csr(artifact_dir, 'tfidf'), load_array(artifact_dir, 'ivf_centroids'),
+                    load_array(artifact_dir, 'ivf_assignments'), n_probe)
+
+
+def recall_report(exact, approximate, rows, k=5):
+    """recall@k of `approximate` against `exact` plus mean / p95 query latency in ms"""
+    hits = 0
+    latencies = {'exact': [], 'approximate': []}
+    for row in rows:
+        start = time.perf_counter()
+        expected, _ = exact.neighbors(row, k)
+        latencies['exact'].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        found, _ = approximate.neighbors(row, k)
+        latencies['approximate'].append(time.perf_counter() - start)
+        hits += len(np.intersect1d(expected, found))
+    report = {'recall': hits / (len(rows) * k)}
+    for name, values in latencies.items():
+        report[f'{name}_mean_ms'] = 1000 * float(np.mean(values))
+        report[f'{name}_p95_ms'] = 1000 * float(np.percentile(values, 95))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train an IVF index and report recall@K against exact search")
+    parser.add_argument('--artifacts', required=True, help="artifact version directory built by pipeline.py")
+    parser.add_argument('--n-lists', type=int, default=None, help="k-means clusters (default: sqrt(N))")
+    parser.add_argument('--n-probe', type=int, nargs='+', default=[1, 2, 4, 8, 16], help="clusters scanned per query")
+    parser.add_argument('--iterations', type=int, default=10, help="k-means iterations")
+    parser.add_argument('--k', type=int, default=5, help="recall@K")
+    parser.add_argument('--queries', type=int, default=500, help="sampled query movies")
+    parser.add_argument('--save', action='store_true',
+                        help="write a new artifact version with the IVF arrays (published if the base is)")
+    args = parser.parse_args()
+
+    vectors = load_csr(args.artifacts, 'tfidf')
+    start = time.perf_counter()
+    centroids, assignments = train_ivf(vectors, args.n_lists, args.iterations)
+    print(f"Trained {len(centroids)} lists over {vectors.shape[0]} movies in {time.perf_counter() - start:.1f}s")
+    if args.save:
+        params = {'n_lists': len(centroids), 'iterations': args.iterations}
+        path = save_ivf_version(args.artifacts, centroids, assignments, params)
+        print(f"Wrote {path}")
+
+    has_index = os.path.exists(os.path.join(args.artifacts, 'neighbor_ids.npy'))
+    exact = load_neighbor_index(args.artifacts) if has_index else ExactSearch(vectors)
+    rows = np.random.default_rng(0).choice(vectors.shape[0], min(args.queries, vectors.shape[0]), replace=False)
+
+    print(f"{'n_probe':>8} {'recall@' + str(args.k):>10} {'ivf ms':>8} {'ivf p95':>8}")
+    for n_probe in args.n_probe:
+        index = IVFIndex(vectors, centroids, assignments, n_probe)
+        report = recall_report(exact, index, rows, args.k)
+        print(f"{n_probe:>8} {report['recall']:>10.3f} "
+              f"{report['approximate_mean_ms']:>8.2f} {report['approximate_p95_ms']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
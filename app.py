@@ -1,9 +1,15 @@
-import streamlit as st
-import pandas as pd
-import requests
-import pickle as pkl
+import os
 import time
-from datetime import datetime
+from urllib.parse import urlparse
+
+import streamlit as st
+
+import metrics
+from artifacts import current_version
+from engine import MovieNotFound, Recommender, default_tmdb_client
+from images import DEFAULT_IMAGE_DIR, ImageCache, serve as serve_images
+from result_cache import ResultCache
+from service import RecommenderClient
 
 # Page Configuration - MUST BE FIRST
 st.set_page_config(
@@ -187,113 +193,119 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
-# Load data with caching
-@st.cache_data
-def load_data():
-    movies_dict = pkl.load(open('movies_dict.pkl', 'rb'))
-    movies = pd.DataFrame(movies_dict)
-    similarity = pkl.load(open('similarity.pkl', 'rb'))
-    return movies, similarity
+# Finished recommendation lists, shared by every session and across reloads;
+# entries from an older artifact version are dropped on first use.
+# RESULT_CACHE_SIZE=0 turns the cache off.
+@st.cache_resource
+def get_result_cache():
+    size = int(os.environ.get('RESULT_CACHE_SIZE', 4096))
+    return ResultCache(size, os.environ.get('RESULT_CACHE_POLICY', 'lru')) if size > 0 else None
 
-movies, similarity = load_data()
+# TMDB client (thread pool, HTTP session, in-memory memo), created once per
+# process and kept across artifact versions
+@st.cache_resource
+def get_tmdb_client():
+    try:
+        token = st.secrets['TMDB_API_TOKEN']
+    except Exception:  # no secrets.toml, fall back to the environment / .env
+        token = None
+    return default_tmdb_client(token)
 
-# TMDB API integration with robust error handling
-@st.cache_data(ttl=3600, show_spinner=False)
-def fetch_movie_details(movie_id):
-    """Fetch complete movie details from TMDB API with retry logic"""
-    max_retries = 3
-    retry_delay = 1  # seconds
-    
-    for attempt in range(max_retries):
-        try:
-            url = f"https://api.themoviedb.org/3/movie/{movie_id}?language=en-US"
-            headers = {
-                "accept": "application/json",
-                "Authorization": f"Bearer {st.secrets['TMDB_API_TOKEN']}"
-            }
-            
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Get genres as comma-separated string
-            genres = ", ".join([genre['name'] for genre in data.get('genres', [])])
-            
-            # Format release date
-            release_date = ""
-            if data.get('release_date'):
-                try:
-                    date_obj = datetime.strptime(data['release_date'], '%Y-%m-%d')
-                    release_date = date_obj.strftime('%b %d, %Y')
-                except:
-                    release_date = data['release_date']
-            
-            return {
-                'poster': f"https://image.tmdb.org/t/p/w500{data['poster_path']}" if data.get('poster_path') else None,
-                'backdrop': f"https://image.tmdb.org/t/p/original{data['backdrop_path']}" if data.get('backdrop_path') else None,
-                'title': data.get('title', ''),
-                'overview': data.get('overview', 'No overview available'),
-                'rating': round(data.get('vote_average', 0), 1),
-                'vote_count': data.get('vote_count', 0),
-                'release_date': release_date,
-                'year': data.get('release_date', '')[:4] if data.get('release_date') else 'N/A',
-                'runtime': f"{data.get('runtime', 0)} min" if data.get('runtime') else 'N/A',
-                'genres': genres,
-                'tagline': data.get('tagline', ''),
-                'imdb_id': data.get('imdb_id', '')
-            }
-                
-        except requests.exceptions.RequestException as e:
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay * (attempt + 1))  # Exponential backoff
-                continue
-            st.error(f"Error fetching data for movie ID {movie_id}: {str(e)}")
-            return None
-        except Exception as e:
-            st.error(f"Unexpected error for movie ID {movie_id}: {str(e)}")
-            return None
+# Recommendation engine, loaded once per artifact version: in-process by
+# default, or a thin client of `python service.py` when RECOMMENDER_URL is set
+@st.cache_resource(max_entries=1)
+def get_recommender(version):
+    service_url = os.environ.get('RECOMMENDER_URL')
+    if service_url:
+        return RecommenderClient(service_url)
+    try:
+        # NEIGHBOR_BACKEND=ivf or embedding[-int8] switches to approximate search
+        # (see ann.py / the pipeline's recall@5 report for the trade-off);
+        # RERANK=0 turns off the metadata re-ranking (rerank.py)
+        return Recommender.load(
+            'artifacts',
+            os.environ.get('NEIGHBOR_BACKEND', 'exact'),
+            n_probe=int(os.environ.get('IVF_N_PROBE', 8)),
+            tmdb=get_tmdb_client(),
+            results=get_result_cache(),
+            rerank=os.environ.get('RERANK', '1') != '0',
+        )
+    except FileNotFoundError as e:
+        st.error(str(e))
+        st.stop()
+
+# Keyed on the published version, so a new deploy is picked up on the next rerun
+recommender = get_recommender(current_version('artifacts'))
+
+# Optional Prometheus scrape endpoint (/metrics) for this Streamlit process
+@st.cache_resource
+def start_metrics_server(port):
+    return metrics.serve(port)
+
+if os.environ.get('METRICS_PORT'):
+    start_metrics_server(int(os.environ['METRICS_PORT']))
+
+# Local WebP thumbnails instead of full-size TMDB images: IMAGE_PORT serves
+# the cache from this process, IMAGE_BASE_URL is the public URL of that server
+# (or of `python images.py`). The URLs end up in the viewer's browser, so
+# "localhost" would mean the viewer's machine.
+@st.cache_resource
+def get_image_cache():
+    port = os.environ.get('IMAGE_PORT')
+    if port:
+        serve_images(DEFAULT_IMAGE_DIR, int(port))
+    return ImageCache(DEFAULT_IMAGE_DIR, os.environ.get('IMAGE_BASE_URL'))
+
+image_cache = get_image_cache()
 
-# Recommendation engine with fallback to local data
-def recommend(selected_movie):
-    """Get movie recommendations based on selected movie"""
+def viewer_image_base_url():
+    """Thumbnail server URL for this viewer: IMAGE_BASE_URL, or IMAGE_PORT on the host they opened"""
+    if image_cache.base_url or not os.environ.get('IMAGE_PORT'):
+        return None  # the cache's own base URL (if any) applies
     try:
-        movie_index = movies[movies['title'] == selected_movie].index[0]
-        distances = similarity[movie_index]
-        movie_list = sorted(list(enumerate(distances)), reverse=True, key=lambda x: x[1])[1:6]
-        
-        recommendations = []
-        for i in movie_list:
-            movie_id = movies.iloc[i[0]].movie_id
-            details = fetch_movie_details(movie_id)
-            
-            if not details:  # Fallback to local data if API fails
-                movie_data = movies.iloc[i[0]]
-                details = {
-                    'title': movie_data.title,
-                    'year': movie_data.get('year', 'N/A'),
-                    'genres': movie_data.get('genres', ''),
-                    'overview': 'Details not available',
-                    'rating': 0,
-                    'poster': None
-                }
-            
-            recommendations.append({
-                'title': movies.iloc[i[0]].title,
-                'id': movie_id,
-                'details': details
-            })
-            
-            # Add small delay between API calls to avoid rate limiting
-            time.sleep(0.2)
-            
-        return recommendations
-        
-    except IndexError:
+        page = urlparse(st.context.url or '')
+    except Exception:  # no browser request (e.g. a bare script run)
+        return None
+    if not page.hostname:
+        return None
+    if page.scheme == 'https':
+        # A plain-http thumbnail server would be blocked as mixed content
+        if not st.session_state.get('image_warning'):
+            st.session_state.image_warning = True
+            st.warning("IMAGE_PORT needs IMAGE_BASE_URL (an https URL for the thumbnail server) "
+                       "when the app is served over https; using TMDB images.")
+        return None
+    return f"http://{page.hostname}:{os.environ['IMAGE_PORT']}"
+
+image_base_url = viewer_image_base_url()
+
+def image_url(url, size='card'):
+    """Cached thumbnail URL, or the placeholder when TMDB has no image"""
+    if not url:
+        return 'https://via.placeholder.com/300x450?text=No+Poster'
+    return image_cache.url(url, size, image_base_url)
+
+# Stage spans of this rerun, for the sidebar debug panel
+page_spans = metrics.begin_trace()
+page_start = time.perf_counter()
+
+def show_fetch_errors(errors):
+    for movie_id, error in errors.items():
+        st.error(f"Error fetching data for movie ID {movie_id}: {error}")
+
+def recommend(selected_movie, k=5):
+    """Get the selected movie and its k most similar movies"""
+    errors = {}
+    try:
+        result = recommender.recommend(selected_movie, k, errors=errors)
+    except MovieNotFound:
         st.error("Movie not found in database")
-        return []
+        return None
     except Exception as e:
         st.error(f"Error generating recommendations: {str(e)}")
-        return []
+        return None
+    show_fetch_errors(errors)
+    return result
 
 # Team Page Function
 def show_team_page():
@@ -391,13 +403,19 @@ with st.sidebar:
     """, unsafe_allow_html=True)
     page = st.radio("Navigate to:", ["Movie Recommender", "Meet the Team"], label_visibility="collapsed")
     
-    # Search box
-    selected_movie = st.selectbox(
+    # Search box: matching runs server-side, only one page of titles goes to the browser
+    search_query = st.text_input(
         "Search for a movie:",
-        movies['title'].values,
-        index=None,
         placeholder="Start typing to search...",
-        key="movie_search"
+        key="movie_query"
+    )
+    matches = [movie['title'] for movie in recommender.search(search_query, limit=10)] if search_query else []
+    selected_movie = st.selectbox(
+        "Matching movies:",
+        matches,
+        index=0 if matches else None,
+        placeholder="No matching movies" if search_query else "Type a title above",
+        label_visibility="collapsed"
     )
     
     # Recommendation button
@@ -410,11 +428,23 @@ with st.sidebar:
     # Featured section
     st.markdown("---")
     st.markdown("### 🔍 Featured Today")
-    featured_movies = movies.sample(3)
-    for _, movie in featured_movies.iterrows():
+    # Precomputed by rails.py and rotated per time bucket; random picks until it has run
+    for movie in recommender.rail('featured', 3, enrich=False):
         with st.container():
             st.markdown(f"**{movie['title']}**")
-            st.caption(f"{movie.get('genres', '')} • {movie.get('year', '')}")
+            st.caption(f"{movie['details']['genres']} • {movie['details']['year']}")
+
+    # Result cache counters (as of the previous rerun)
+    cache_stats = recommender.cache_stats()
+    if cache_stats:
+        st.markdown("---")
+        st.caption(f"Result cache: {cache_stats['hit_rate']:.0%} hits "
+                   f"({cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']}), "
+                   f"{cache_stats['entries']} entries, version {cache_stats['version']}")
+
+    # Latency debug panel, filled in once the page has rendered
+    show_debug = st.checkbox("Show latency debug panel", key="debug_panel")
+    debug_panel = st.empty()
 
 # Main Content Area
 if page == "Movie Recommender":
@@ -452,22 +482,17 @@ if page == "Movie Recommender":
         
         # Trending movies section
         st.markdown("### 🎥 Trending Now")
-        trending_movies = movies.sample(5)
+        errors = {}
+        trending_movies = recommender.rail('trending', 5, errors=errors)
+        show_fetch_errors(errors)
         cols = st.columns(5)
-        for idx, (_, movie) in enumerate(trending_movies.iterrows()):
+        for idx, movie in enumerate(trending_movies):
             with cols[idx]:
-                details = fetch_movie_details(movie['movie_id'])
-                if not details:  # Fallback to local data
-                    details = {
-                        'poster': None,
-                        'title': movie['title'],
-                        'rating': 0,
-                        'year': movie.get('year', 'N/A')
-                    }
+                details = movie['details']
                 
                 st.markdown(f"""
                     <div class="movie-card">
-                        <img src="{details['poster'] if details['poster'] else 'https://via.placeholder.com/300x450?text=No+Poster'}" 
+                        <img src="{image_url(details['poster'])}" 
                              class="movie-poster">
                         <div class="movie-info">
                             <div class="movie-title">{movie['title']}</div>
@@ -482,38 +507,19 @@ if page == "Movie Recommender":
     elif selected_movie:
         # Loading state
         with st.spinner('Analyzing your movie taste...'):
-            time.sleep(0.5)  # Simulate loading for better UX
-            
-            recommendations = recommend(selected_movie)
+            # The selected movie and its recommendations come back from one batched lookup
+            result = recommend(selected_movie)
+            recommendations = result['recommendations'] if result else []
             
             if recommendations:
                 # Selected movie showcase
-                selected_movie_data = movies[movies['title'] == selected_movie].iloc[0]
-                selected_details = fetch_movie_details(selected_movie_data['movie_id'])
-                
-                if not selected_details:  # Fallback to local data
-                    selected_details = {
-                        'title': selected_movie_data['title'],
-                        'year': selected_movie_data.get('year', 'N/A'),
-                        'genres': selected_movie_data.get('genres', ''),
-                        'overview': 'Details not available',
-                        'rating': 0,
-                        'poster': None,
-                        'vote_count': 0,
-                        'release_date': '',
-                        'runtime': 'N/A',
-                        'tagline': '',
-                        'imdb_id': ''
-                    }
+                selected_details = result['movie']['details']
                 
                 st.markdown(f"<h2>Because you liked: <span style='color: var(--primary)'>{selected_movie}</span></h2>", unsafe_allow_html=True)
                 
                 col1, col2 = st.columns([1, 2])
                 with col1:
-                    if selected_details['poster']:
-                        st.image(selected_details['poster'])
-                    else:
-                        st.image('https://via.placeholder.com/300x450?text=No+Poster')
+                    st.image(image_url(selected_details['poster'], 'poster'))
                 
                 with col2:
                     st.markdown(f"**Rating:** ⭐ {selected_details['rating']} ({selected_details['vote_count']} votes)")
@@ -540,7 +546,7 @@ if page == "Movie Recommender":
                         if movie['details']:
                             st.markdown(f"""
                                 <div class="movie-card">
-                                    <img src="{movie['details']['poster'] if movie['details']['poster'] else 'https://via.placeholder.com/300x450?text=No+Poster'}" 
+                                    <img src="{image_url(movie['details']['poster'])}" 
                                          class="movie-poster">
                                     <div class="movie-info">
                                         <div class="movie-title">{movie['title']}</div>
@@ -568,3 +574,15 @@ if page == "Movie Recommender":
 elif page == "Meet the Team":
     show_team_page()
 
+# Whole-script time, then the debug panel
+metrics.observe('render', time.perf_counter() - page_start)
+if show_debug:
+    with debug_panel.container():
+        st.markdown("**This run**")
+        st.dataframe([{'stage': stage, 'ms': round(1000 * seconds, 2)} for stage, seconds in page_spans],
+                     hide_index=True)
+        st.markdown("**All runs in this process**")
+        st.dataframe([{'stage': stage, 'count': summary['count'], 'mean ms': round(summary['mean_ms'], 2),
+                       'p95 ms ≤': round(summary['p95_ms'], 2)}
+                      for stage, summary in metrics.stage_summary().items()],
+                     hide_index=True)
@@ -0,0 +1,106 @@
+"""Versioned model artifacts.
+
+Each build writes a new directory under the artifact root, e.g.
+`artifacts/20250421-120000/`, and only then points `artifacts/CURRENT` at it
+with an atomic rename. Readers therefore always see a complete version, and
+rolling back is just rewriting CURRENT.
+
+Everything inside a version is stored as plain .npy arrays (plus JSON), never
+pickle. Arrays are opened with mmap_mode='r', so loading is lazy and
+zero-copy: every app process on a host shares the same pages of the OS page
+cache instead of holding a private deserialized copy.
+"""
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+DEFAULT_ARTIFACT_ROOT = 'artifacts'
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+
+
+def new_version():
+    """Sortable version name for a build started now"""
+    return datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S-%f')
+
+
+def version_dir(root, version):
+    return os.path.join(root, version)
+
+
+def write_manifest(path, manifest):
+    with open(os.path.join(path, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+def save_array(path, name, array):
+    np.save(os.path.join(path, f'{name}.npy'), np.ascontiguousarray(array))
+
+
+def load_array(path, name, mmap=True):
+    """Array `name` of an artifact version, memory-mapped read-only by default"""
+    return np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r' if mmap else None)
+
+
+def save_strings(path, name, strings):
+    """Store a string column as one NUL-separated UTF-8 byte array"""
+    strings = [str(value) for value in strings]
+    if any('\0' in value for value in strings):
+        raise ValueError(f"Column {name} contains NUL characters")
+    blob = '\0'.join(strings).encode('utf-8')
+    save_array(path, name, np.frombuffer(blob, dtype=np.uint8))
+
+
+def load_strings(path, name):
+    """List of strings saved with save_strings (one decode for the whole column)"""
+    blob = load_array(path, name)
+    if len(blob) == 0:
+        return []
+    return bytes(blob).decode('utf-8').split('\0')
+
+
+def save_csr(path, name, matrix):
+    """Store a CSR matrix as data / indices / indptr / shape arrays"""
+    save_array(path, f'{name}_data', matrix.data)
+    save_array(path, f'{name}_indices', matrix.indices)
+    save_array(path, f'{name}_indptr', matrix.indptr)
+    save_array(path, f'{name}_shape', np.array(matrix.shape, dtype=np.int64))
+
+
+def load_csr(path, name):
+    """CSR matrix over memory-mapped arrays written by save_csr"""
+    from scipy import sparse  # only the build and the ANN backend need scipy
+    shape = tuple(int(size) for size in load_array(path, f'{name}_shape', mmap=False))
+    arrays = (load_array(path, f'{name}_data'), load_array(path, f'{name}_indices'),
+              load_array(path, f'{name}_indptr'))
+    return sparse.csr_matrix(arrays, shape=shape, copy=False)
+
+
+def publish(root, version):
+    """Atomically make `version` the one served by the app"""
+    tmp = os.path.join(root, f'.{CURRENT_FILE}.{os.getpid()}')
+    with open(tmp, 'w') as f:
+        f.write(version + '\n')
+    os.replace(tmp, os.path.join(root, CURRENT_FILE))
+
+
+def current_version(root=DEFAULT_ARTIFACT_ROOT):
+    """Name of the published version, or None if nothing was published yet"""
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def current_version_dir(root=DEFAULT_ARTIFACT_ROOT):
+    """Directory of the published version, or None"""
+    version = current_version(root)
+    return version_dir(root, version) if version else None
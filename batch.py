@@ -0,0 +1,109 @@
+"""Batch recommendations for many seed movies at once.
+
+Two modes, both vectorized over the whole batch of seeds:
+
+* rails: the k most similar titles for every seed (e.g. the whole catalog),
+  gathered straight from the neighbor index arrays;
+* multi-seed queries ("because you liked A, B and C"): the seeds' neighbor
+  lists are merged into one seed x candidate score matrix and aggregated with
+  mean, max or a weighted mean.
+
+Results stream to a JSONL file and the run reports throughput in seeds/s.
+
+Usage:
+    python batch.py --all --k 10 --output rails.jsonl
+    python batch.py --titles seeds.txt --output rails.jsonl
+    python batch.py --queries queries.jsonl --aggregate weighted --output multi.jsonl
+(queries.jsonl lines look like {"titles": ["Avatar", "Titanic"], "weights": [2, 1]})
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from artifacts import DEFAULT_ARTIFACT_ROOT
+from engine import MovieNotFound, Recommender
+from neighbors import AGGREGATES, BACKENDS, aggregate_seeds, neighbors_many
+
+
+def _card(recommender, row, score=None):
+    card = {'movie_id': recommender.movie_id(row), 'title': recommender.title(row)}
+    if score is not None:
+        card['score'] = round(float(score), 6)
+    return card
+
+
+def write_rails(recommender, rows, k, out, batch_size=4096):
+    """Write one {"movie_id", "title", "similar": [...]} line per seed row"""
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        ids, scores = neighbors_many(recommender.neighbor_index, batch, k)
+        for row, row_ids, row_scores in zip(batch, ids, scores):
+            record = _card(recommender, row)
+            record['similar'] = [_card(recommender, i, s) for i, s in zip(row_ids, row_scores) if i >= 0]
+            out.write(json.dumps(record) + '\n')
+        yield len(batch)
+
+
+def write_queries(recommender, queries, k, method, out):
+    """Write one {"seeds", "recommendations"} line per multi-seed query"""
+    for query in queries:
+        try:
+            rows = [recommender.row(title) for title in query['titles']]
+        except MovieNotFound as e:
+            out.write(json.dumps({'seeds': query['titles'], 'error': f"movie not found: {e.args[0]}"}) + '\n')
+            yield len(query['titles'])
+            continue
+        try:
+            ids, scores = aggregate_seeds(recommender.neighbor_index, rows, k, method, query.get('weights'))
+        except ValueError as e:  # unusable weights
+            out.write(json.dumps({'seeds': query['titles'], 'error': str(e)}) + '\n')
+            yield len(rows)
+            continue
+        out.write(json.dumps({
+            'seeds': [_card(recommender, row) for row in rows],
+            'recommendations': [_card(recommender, i, s) for i, s in zip(ids, scores)],
+        }) + '\n')
+        yield len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute recommendations for many seed movies")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--all', action='store_true', help="similar-titles rail for every catalog movie")
+    source.add_argument('--titles', help="text file with one seed title per line")
+    source.add_argument('--queries', help="JSONL multi-seed queries: {\"titles\": [...], \"weights\": [...]}")
+    parser.add_argument('--output', required=True, help="JSONL file to write")
+    parser.add_argument('--k', type=int, default=10, help="recommendations per seed or query")
+    parser.add_argument('--aggregate', default='mean', choices=AGGREGATES, help="multi-seed score aggregation")
+    parser.add_argument('--artifacts', default=DEFAULT_ARTIFACT_ROOT, help="artifact root")
+    parser.add_argument('--backend', default='exact', choices=BACKENDS, help="neighbor backend")
+    args = parser.parse_args()
+
+    recommender = Recommender.load(args.artifacts, args.backend)
+    with open(args.output, 'w') as out:
+        if args.queries:
+            with open(args.queries) as f:
+                queries = [json.loads(line) for line in f if line.strip()]
+            progress = write_queries(recommender, queries, args.k, args.aggregate, out)
+        else:
+            if args.all:
+                rows = np.arange(len(recommender))
+            else:
+                with open(args.titles) as f:
+                    titles = [line.strip() for line in f if line.strip()]
+                rows = np.array([row for row in map(recommender.title_index.row, titles) if row is not None])
+            progress = write_rails(recommender, rows, args.k, out)
+
+        start = time.perf_counter()
+        seeds = 0
+        for done in progress:
+            seeds += done
+        elapsed = time.perf_counter() - start
+
+    print(f"{seeds} seeds in {elapsed:.2f}s ({seeds / max(elapsed, 1e-9):,.0f} seeds/s) -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
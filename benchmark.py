@@ -0,0 +1,200 @@
+"""Reproducible latency benchmarks for the serving path.
+
+For each catalog size a synthetic artifact version (random titles and a random
+top-K neighbor index) is written to a temporary root, and every stage a page
+view goes through is timed:
+
+    load_cold      Recommender.load in a fresh process
+    load_warm      Recommender.load again in this process
+    title_lookup   exact title -> row
+    search         typeahead on 4-letter prefixes and misspelled titles
+    rank           top-K from the neighbor index
+    recommend      recommend() without enrichment
+    page_cold      recommend() with enrichment, empty metadata cache
+    page_warm      the same titles again, metadata cache populated
+
+It also checks that a traced page view includes the TMDB fetch spans
+(`tmdb_attempt`), which run on the client's worker threads.
+
+TMDB is replaced by a local stub (stub_tmdb.py) with a fixed latency, so the
+numbers only depend on this code and the machine. Results (ms percentiles per
+stage and size) go to a JSON file together with the commit and environment,
+to compare runs across commits:
+
+    python benchmark.py --sizes 5000 50000 500000 --output benchmarks/$(git rev-parse --short HEAD).json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import artifacts
+from catalog import save_catalog
+from engine import Recommender
+from metadata_cache import MetadataCache
+from metrics import trace
+from neighbors import DEFAULT_K, NeighborIndex, save_neighbor_index
+from stub_tmdb import StubTMDB
+from tmdb import TMDBClient
+
+WORDS = ('dark night star war love lost city king last dead house blood girl man world day '
+         'time dream story secret life fire ice island return rise fall black white red').split()
+
+
+def synthetic_catalog(root, n, k=DEFAULT_K, seed=0):
+    """Publish an n-movie artifact version with random titles and neighbors"""
+    rng = np.random.default_rng(seed)
+    words = np.array(WORDS)
+    picks = words[rng.integers(len(words), size=(n, 3))]
+    titles = [f"{a.title()} {b.title()} {c.title()} {i}" for i, (a, b, c) in enumerate(picks)]
+    movies = pd.DataFrame({'movie_id': np.arange(1, n + 1, dtype=np.int64), 'title': titles})
+
+    ids = rng.integers(0, n, size=(n, k), dtype=np.int32)
+    scores = -np.sort(-rng.random((n, k), dtype=np.float32), axis=1)
+
+    version = artifacts.new_version()
+    path = artifacts.version_dir(root, version)
+    os.makedirs(path)
+    save_catalog(path, movies)
+    save_neighbor_index(NeighborIndex(ids, scores), path)
+    artifacts.write_manifest(path, {'version': version, 'movies': n, 'k': k, 'source': 'synthetic'})
+    artifacts.publish(root, version)
+    return version
+
+
+def summarize(seconds):
+    """Millisecond percentiles of a list of timings"""
+    ms = np.asarray(seconds) * 1000
+    return {
+        'n': len(ms),
+        'mean_ms': round(float(ms.mean()), 4),
+        'p50_ms': round(float(np.percentile(ms, 50)), 4),
+        'p95_ms': round(float(np.percentile(ms, 95)), 4),
+        'p99_ms': round(float(np.percentile(ms, 99)), 4),
+        'max_ms': round(float(ms.max()), 4),
+    }
+
+
+def timed(fn, args_list):
+    timings = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _load_seconds(root):
+    start = time.perf_counter()
+    Recommender.load(root)
+    return time.perf_counter() - start
+
+
+def misspell(title, rng):
+    """Drop one character from the first word, as a typo"""
+    word = title.split(' ')[0]
+    i = rng.randrange(len(word))
+    return word[:i] + word[i + 1:]
+
+
+def bench_size(n, queries, page_queries, k, stub, workdir, seed=0):
+    """{stage: summary} for one catalog size"""
+    root = os.path.join(workdir, f'catalog-{n}')
+    start = time.perf_counter()
+    synthetic_catalog(root, n, seed=seed)
+    results = {'build_s': round(time.perf_counter() - start, 3)}
+
+    # A fresh interpreter per cold load: nothing memoized or mapped yet
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        results['load_cold'] = summarize([pool.apply(_load_seconds, (root,))])
+    results['load_warm'] = summarize(timed(_load_seconds, [(root,)] * 3))
+
+    cache = MetadataCache(os.path.join(workdir, f'cache-{n}.sqlite'))
+    stub_client = lambda: TMDBClient('stub-token', cache=cache, max_workers=16, requests_per_second=10000,
+                                     burst=10000, movie_url=stub.movie_url)
+    recommender = Recommender.load(root, tmdb=stub_client())
+    rng = random.Random(seed)
+    rows = [rng.randrange(n) for _ in range(queries)]
+    titles = [recommender.title(row) for row in rows]
+
+    results['title_lookup'] = summarize(timed(recommender.row, [(title,) for title in titles]))
+    prefixes = [(title[:4],) for title in titles[:queries // 2]]
+    typos = [(misspell(title, rng),) for title in titles[queries // 2:]]
+    results['search'] = summarize(timed(recommender.search, prefixes + typos))
+    results['rank'] = summarize(timed(recommender.neighbor_index.neighbors, [(row, k) for row in rows]))
+    results['recommend'] = summarize(timed(recommender.recommend, [(title, k, False) for title in titles]))
+
+    page_titles = [(title, k) for title in titles[:page_queries]]
+    results['page_cold'] = summarize(timed(recommender.recommend, page_titles))
+    queried = set(rows)
+    check_trace(recommender, next(row for row in range(n) if row not in queried), k)  # not cached yet
+    recommender.tmdb = stub_client()  # no in-memory memo, so the warm pass reads SQLite
+    results['page_warm'] = summarize(timed(recommender.recommend, page_titles))
+    return results
+
+
+def check_trace(recommender, row, k):
+    """A traced page view must include its TMDB fetch spans (the app's debug panel shows them)"""
+    with trace() as spans:
+        recommender.recommend(recommender.title(row), k)
+    stages = {stage for stage, _ in spans}
+    if 'tmdb_attempt' not in stages:
+        raise AssertionError(f"TMDB spans missing from a traced recommend(): {sorted(stages)}")
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark load, lookup, ranking and page latency")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5000, 50000, 500000], help="catalog sizes")
+    parser.add_argument('--queries', type=int, default=500, help="lookups / rankings timed per size")
+    parser.add_argument('--page-queries', type=int, default=50, help="enriched page views timed per size")
+    parser.add_argument('--k', type=int, default=5, help="recommendations per page")
+    parser.add_argument('--tmdb-latency', type=float, default=0.05, help="stub TMDB latency in seconds")
+    parser.add_argument('--output', default='benchmark.json', help="JSON results file")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    report = {'environment': environment(), 'params': vars(args), 'sizes': {}}
+    with tempfile.TemporaryDirectory(prefix='benchmark-') as workdir, StubTMDB(args.tmdb_latency) as stub:
+        for n in args.sizes:
+            results = bench_size(n, args.queries, args.page_queries, args.k, stub, workdir, args.seed)
+            report['sizes'][str(n)] = results
+            print(f"{n:>8} movies: load {results['load_cold']['p50_ms']:.0f}/{results['load_warm']['p50_ms']:.0f} ms "
+                  f"(cold/warm), lookup p95 {results['title_lookup']['p95_ms']:.3f} ms, "
+                  f"search p95 {results['search']['p95_ms']:.2f} ms, "
+                  f"recommend p95 {results['recommend']['p95_ms']:.2f} ms, "
+                  f"page p95 {results['page_cold']['p95_ms']:.0f}/{results['page_warm']['p95_ms']:.1f} ms (cold/warm)")
+        report['stub_requests'] = stub.requests
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
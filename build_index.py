@@ -0,0 +1,52 @@
+"""Offline conversion of the notebook's pickles into a published artifact version.
+
+Reads `movies_dict.pkl` and the dense `similarity.pkl` once, reduces the
+similarity matrix to a top-K neighbor index and writes both as memory-mapped
+arrays under the artifact root, so the app never unpickles anything.
+
+Usage:
+    python build_index.py --movies movies_dict.pkl --similarity similarity.pkl --output artifacts --k 50
+"""
+import argparse
+import os
+import pickle as pkl
+import time
+
+import pandas as pd
+
+import artifacts
+from catalog import save_catalog
+from neighbors import DEFAULT_K, build_neighbor_index, save_neighbor_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the artifacts used by app.py from the notebook pickles")
+    parser.add_argument('--movies', default='movies_dict.pkl', help="catalog dumped by Movies.ipynb")
+    parser.add_argument('--similarity', default='similarity.pkl', help="dense similarity matrix from Movies.ipynb")
+    parser.add_argument('--output', default=artifacts.DEFAULT_ARTIFACT_ROOT, help="artifact root directory")
+    parser.add_argument('--k', type=int, default=DEFAULT_K, help="neighbors kept per movie")
+    parser.add_argument('--block-size', type=int, default=1024, help="rows processed at a time")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with open(args.movies, 'rb') as f:
+        # Positional rows line up with the rows of the similarity matrix
+        movies = pd.DataFrame(pkl.load(f)).reset_index(drop=True)
+    with open(args.similarity, 'rb') as f:
+        similarity = pkl.load(f)
+    index = build_neighbor_index(similarity, k=args.k, block_size=args.block_size)
+
+    version = artifacts.new_version()
+    path = artifacts.version_dir(args.output, version)
+    os.makedirs(path)
+    save_catalog(path, movies)
+    save_neighbor_index(index, path)
+    artifacts.write_manifest(path, {'version': version, 'movies': len(movies), 'k': index.k,
+                                    'source': [args.movies, args.similarity]})
+    artifacts.publish(args.output, version)
+    print(f"Published version {version}: {len(index)} x {index.k} neighbors "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
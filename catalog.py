@@ -0,0 +1,67 @@
+"""Catalog loading and hashed lookups from movie titles and ids to catalog rows.
+
+Built once when the catalog is loaded so that request handlers never scan the
+`title` column with a boolean mask.
+"""
+import re
+import unicodedata
+
+import pandas as pd
+
+from artifacts import load_array, load_strings, save_array, save_strings
+
+
+def save_catalog(path, movies):
+    """Write the movie_id / title columns into an artifact version directory"""
+    save_array(path, 'movie_id', movies['movie_id'].to_numpy(dtype='int64'))
+    save_strings(path, 'title', movies['title'])
+
+
+def load_catalog(path):
+    """Load the catalog DataFrame; positional rows line up with the neighbor index"""
+    return pd.DataFrame({
+        'movie_id': load_array(path, 'movie_id'),
+        'title': load_strings(path, 'title'),
+    })
+
+
+def normalize_title(title):
+    """Case-fold, unicode-normalize and collapse whitespace in a title"""
+    title = unicodedata.normalize('NFKC', str(title)).casefold()
+    return re.sub(r'\s+', ' ', title).strip()
+
+
+class TitleIndex:
+    """title -> row, movie_id -> row and normalized title -> row lookups.
+
+    Duplicate titles are resolved deterministically: the lowest row wins, and
+    all matching rows stay available through `rows()`.
+    """
+
+    def __init__(self, movies):
+        self._by_title = {}
+        self._by_normalized = {}
+        self._by_id = {}
+        for row, (title, movie_id) in enumerate(zip(movies['title'], movies['movie_id'])):
+            self._by_title.setdefault(title, []).append(row)
+            self._by_normalized.setdefault(normalize_title(title), []).append(row)
+            self._by_id.setdefault(int(movie_id), row)
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def rows(self, title):
+        """All rows with this title, exact match first then normalized match"""
+        rows = self._by_title.get(title)
+        if rows is None:
+            rows = self._by_normalized.get(normalize_title(title), [])
+        return list(rows)
+
+    def row(self, title):
+        """Row of the movie with this title, or None if it is not in the catalog"""
+        rows = self.rows(title)
+        return rows[0] if rows else None
+
+    def row_for_id(self, movie_id):
+        """Row of the movie with this TMDB id, or None"""
+        return self._by_id.get(int(movie_id))
@@ -0,0 +1,208 @@
+"""Recommendation engine independent of Streamlit.
+
+`Recommender` bundles everything a request needs: the catalog, the title
+lookups, the neighbor backend and TMDB enrichment. It is loaded once per
+process and used both in-process by app.py and behind the HTTP service in
+service.py.
+"""
+import os
+import random
+
+from artifacts import DEFAULT_ARTIFACT_ROOT, current_version, version_dir
+from catalog import TitleIndex, load_catalog
+from metadata_cache import DEFAULT_CACHE_PATH, MetadataCache
+from metrics import count, span
+from neighbors import aggregate_seeds, load_backend
+from rails import RailStore
+from rerank import Reranker, has_features, load_features
+from search import TitleSearch
+from tmdb import TMDB_MOVIE_URL, TMDBClient
+
+
+class MovieNotFound(KeyError):
+    """The requested title is not in the catalog"""
+
+
+def fallback_details(title):
+    """Local stand-in for TMDB details when the API is unavailable"""
+    return {
+        'title': title,
+        'year': 'N/A',
+        'genres': '',
+        'overview': 'Details not available',
+        'rating': 0,
+        'poster': None,
+        'backdrop': None,
+        'vote_count': 0,
+        'release_date': '',
+        'runtime': 'N/A',
+        'tagline': '',
+        'imdb_id': ''
+    }
+
+
+def default_tmdb_client(token=None, cache_path=DEFAULT_CACHE_PATH):
+    """TMDB client using TMDB_API_TOKEN and the shared on-disk metadata cache.
+
+    TMDB_MOVIE_URL points it at another server, e.g. the stub used by loadtest.py.
+    """
+    return TMDBClient(token or os.environ.get('TMDB_API_TOKEN'), cache=MetadataCache(cache_path),
+                      movie_url=os.environ.get('TMDB_MOVIE_URL', TMDB_MOVIE_URL))
+
+
+class Recommender:
+    """Title lookup, top-K ranking and enrichment over one artifact version"""
+
+    def __init__(self, movies, neighbor_index, tmdb=None, version=None, results=None, rails=None,
+                 reranker=None):
+        self.movies = movies
+        self.neighbor_index = neighbor_index
+        self.title_index = TitleIndex(movies)
+        self.tmdb = tmdb
+        self.version = version
+        self.results = results  # optional ResultCache, shared across reloads
+        self.rails = rails      # optional RailStore of precomputed featured/trending rails
+        self.reranker = reranker  # optional metadata Reranker over a wider candidate set
+        self._movie_ids = movies['movie_id'].to_numpy()
+        self._titles = movies['title'].tolist()
+        self.search_index = TitleSearch(self._titles)
+
+    @classmethod
+    def load(cls, root=DEFAULT_ARTIFACT_ROOT, backend='exact', n_probe=8, tmdb=None, results=None, rerank=True):
+        """Load the published artifact version under `root`.
+
+        Re-ranking is on when `rerank` is set and the version has metadata features.
+        """
+        version = current_version(root)
+        if version is None:
+            raise FileNotFoundError(
+                f"No published artifacts in {root!r}; run `python pipeline.py` or `python build_index.py`"
+            )
+        path = version_dir(root, version)
+        with span('load'):
+            reranker = Reranker(load_features(path)) if rerank and has_features(path) else None
+            return cls(load_catalog(path), load_backend(path, backend, n_probe), tmdb, version, results,
+                       RailStore(root), reranker)
+
+    def __len__(self):
+        return len(self._titles)
+
+    def titles(self):
+        return list(self._titles)
+
+    def cache_stats(self):
+        """Hit/miss counters of the result cache, or None without one"""
+        return self.results.stats() if self.results is not None else None
+
+    def search(self, query, limit=10, offset=0):
+        """Typeahead matches for a partial, possibly misspelled title"""
+        with span('search'):
+            rows = self.search_index.search(query, limit, offset)
+        return [{'title': self._titles[row], 'id': self.movie_id(row)} for row in rows]
+
+    def title(self, row):
+        return self._titles[row]
+
+    def movie_id(self, row):
+        return int(self._movie_ids[row])
+
+    def row(self, title):
+        """Catalog row for a title, raising MovieNotFound"""
+        with span('lookup'):
+            row = self.title_index.row(title)
+        if row is None:
+            raise MovieNotFound(title)
+        return row
+
+    def similar(self, title, k=5):
+        """(rows, scores) of the k movies most similar to `title`"""
+        return self.neighbor_index.neighbors(self.row(title), k)
+
+    def _depth(self, k):
+        """Candidates to pull from the content index for k results"""
+        return max(k, self.reranker.candidates) if self.reranker is not None else k
+
+    def _rerank(self, rows, scores, k):
+        if self.reranker is None:
+            return rows, scores
+        with span('rerank'):
+            return self.reranker.rerank(rows, scores, k)
+
+    def _items(self, rows, enrich=True, errors=None):
+        """Card dicts for catalog rows, with TMDB details fetched as one batch"""
+        movie_ids = [int(self._movie_ids[row]) for row in rows]
+        details = [None] * len(movie_ids)
+        if enrich and self.tmdb is not None:
+            with span('enrich'):
+                details = self.tmdb.details_many(movie_ids, errors=errors)
+
+        items = []
+        for row, movie_id, movie_details in zip(rows, movie_ids, details):
+            title = self._titles[row]
+            items.append({'title': title, 'id': movie_id, 'details': movie_details or fallback_details(title)})
+        return items
+
+    def recommend(self, title, k=5, enrich=True, errors=None):
+        """The selected movie and its k recommendations.
+
+        Details for all k + 1 movies are fetched in a single concurrent batch.
+        With a result cache, repeated requests for the same (movie, k) on the
+        same artifact version are served from memory.
+        Returns {'movie': item, 'recommendations': [item, ...]}.
+        """
+        row = self.row(title)
+        key = ('recommend', row, k, enrich)
+        if self.results is not None:
+            cached = self.results.get(key, self.version)
+            count('recommender_result_cache_total', 'Result cache lookups', 'result',
+                  'miss' if cached is None else 'hit')
+            if cached is not None:
+                return dict(cached)
+
+        fetch_errors = {}
+        with span('rank'):
+            rows, scores = self.neighbor_index.neighbors(row, self._depth(k))
+        rows, scores = self._rerank(rows, scores, k)
+        items = self._items([row, *rows], enrich, fetch_errors)
+        for item, score in zip(items[1:], scores):
+            item['score'] = float(score)
+        result = {'movie': items[0], 'recommendations': items[1:]}
+        if errors is not None:
+            errors.update(fetch_errors)
+        # Results with fallback details are not cached so a TMDB hiccup doesn't stick
+        if self.results is not None and not fetch_errors:
+            self.results.put(key, self.version, result)
+        return dict(result)
+
+    def sample(self, n, enrich=True, errors=None):
+        """n random catalog movies"""
+        rows = random.sample(range(len(self)), min(n, len(self)))
+        return self._items(rows, enrich=enrich, errors=errors)
+
+    def rail(self, name, n, enrich=True, errors=None):
+        """A precomputed rail ('featured' or 'trending') for the current time bucket.
+
+        Rail items carry the details cached when the rail was built, so no
+        TMDB calls are made. Falls back to n random movies when no rails have
+        been built yet.
+        """
+        with span('rail'):
+            items = self.rails.rail(name, n) if self.rails is not None else None
+        if items is None:
+            return self.sample(n, enrich=enrich, errors=errors)
+        # Rails built for an older catalog may mention movies that are gone
+        return [item for item in items if self.title_index.row_for_id(item['id']) is not None]
+
+    def recommend_many(self, titles, k=5, aggregate='mean', weights=None, enrich=True, errors=None):
+        """Recommendations for several seed movies taken together.
+
+        Returns {'movies': [seed items], 'recommendations': [item, ...]}.
+        """
+        rows = [self.row(title) for title in titles]
+        with span('rank'):
+            ids, scores = aggregate_seeds(self.neighbor_index, rows, self._depth(k), aggregate, weights)
+        ids, scores = self._rerank(ids, scores, k)
+        items = self._items([*rows, *ids], enrich, errors)
+        for item, score in zip(items[len(rows):], scores):
+            item['score'] = float(score)
+        return {'movies': items[:len(rows)], 'recommendations': items[len(rows):]}
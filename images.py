@@ -0,0 +1,200 @@
+"""Local poster/backdrop cache with resized WebP thumbnails.
+
+TMDB image URLs are fetched once, resized with Pillow to the widths the UI
+actually renders and stored as WebP under the cache directory:
+
+    image_cache/<size>/<key[:2]>/<key>.webp
+
+`serve()` serves that directory over HTTP with long-lived, immutable cache
+headers (a file never changes once written), so browsers download each
+thumbnail once and cards keep their images through a TMDB outage.
+`ImageCache.url()` returns the local URL for a cached image, or the original
+URL while the image is fetched in the background. warm_images.py fills the
+cache for the whole catalog.
+
+Usage (standalone server; app.py can also run it in-process, see IMAGE_PORT):
+    python images.py --dir image_cache --port 8601
+"""
+import argparse
+import hashlib
+import io
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from PIL import Image
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IMAGE_DIR = 'image_cache'
+# size name -> (width in px, TMDB size fetched as the source)
+SIZES = {
+    'card': (342, 'w500'),
+    'poster': (500, 'w500'),
+    'backdrop': (1280, 'w1280'),
+}
+KIND_SIZES = {'poster': ('card', 'poster'), 'backdrop': ('backdrop',)}
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+_TMDB_SIZE = re.compile(r'/t/p/[^/]+/')
+_KEY = re.compile(r'^[0-9a-f]{40}$')
+
+
+def image_key(url):
+    """Cache key of an image: the TMDB file path, whatever size the URL asks for"""
+    return hashlib.sha1(_TMDB_SIZE.sub('/t/p/', url).encode('utf-8')).hexdigest()
+
+
+def thumbnail(data, width, quality=80):
+    """WebP bytes of an image scaled down to `width` (never up)"""
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert('RGB')
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        out = io.BytesIO()
+        image.save(out, 'WEBP', quality=quality, method=4)
+        return out.getvalue()
+
+
+class ImageCache:
+    """On-disk WebP thumbnails of TMDB images, fetched on demand or in bulk"""
+
+    def __init__(self, root=DEFAULT_IMAGE_DIR, base_url=None, max_workers=8, quality=80, timeout=10):
+        self.root = root
+        self.base_url = base_url.rstrip('/') if base_url else None
+        self.quality = quality
+        self.timeout = timeout
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='images')
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def path(self, url, size):
+        key = image_key(url)
+        return os.path.join(self.root, size, key[:2], f'{key}.webp')
+
+    def cached(self, url, size):
+        return os.path.exists(self.path(url, size))
+
+    def fetch(self, url, kind='poster'):
+        """Download one image and write every thumbnail size of its kind"""
+        sizes = [size for size in KIND_SIZES[kind] if not self.cached(url, size)]
+        if not sizes:
+            return
+        response = self._session.get(_TMDB_SIZE.sub(f'/t/p/{SIZES[sizes[-1]][1]}/', url), timeout=self.timeout)
+        response.raise_for_status()
+        for size in sizes:
+            path = self.path(url, size)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(thumbnail(response.content, SIZES[size][0], self.quality))
+            os.replace(tmp, path)  # readers never see a partial file
+
+    def _fetch_quietly(self, url, kind):
+        try:
+            self.fetch(url, kind)
+        except Exception as e:
+            logger.warning("Could not cache image %s: %s", url, e)
+        finally:
+            with self._lock:
+                self._pending.discard(url)
+
+    def prefetch(self, url, kind='poster'):
+        """Fetch an image in the background, once"""
+        with self._lock:
+            if url in self._pending:
+                return
+            self._pending.add(url)
+        self._executor.submit(self._fetch_quietly, url, kind)
+
+    def url(self, url, size='card', base_url=None):
+        """Local URL of the thumbnail if cached; otherwise the original, queued for caching.
+
+        `base_url` overrides the cache's own, e.g. per viewer.
+        """
+        base_url = base_url or self.base_url
+        if not url or base_url is None:
+            return url
+        if self.cached(url, size):
+            return f'{base_url.rstrip("/")}/{size}/{image_key(url)}.webp'
+        self.prefetch(url, 'backdrop' if size == 'backdrop' else 'poster')
+        return url
+
+    def warm(self, items):
+        """Fetch (url, kind) pairs concurrently; returns {url: error} for failures"""
+        futures = {url: self._executor.submit(self.fetch, url, kind) for url, kind in items if url}
+        errors = {}
+        for url, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                errors[url] = str(e)
+        return errors
+
+
+def serve(root=DEFAULT_IMAGE_DIR, port=8601, host='0.0.0.0'):
+    """Serve /<size>/<key>.webp from the cache directory on a background thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = self.path.split('?')[0].strip('/').split('/')
+            path = None
+            if len(parts) == 2 and parts[0] in SIZES and parts[1].endswith('.webp'):
+                key = parts[1][:-len('.webp')]
+                if _KEY.match(key):
+                    path = os.path.join(root, parts[0], key[:2], parts[1])
+            if path is None or not os.path.exists(path):
+                self.send_error(404)
+                return
+            etag = f'"{key}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', CACHE_CONTROL)
+                self.end_headers()
+                return
+            with open(path, 'rb') as f:
+                body = f.read()
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/webp')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Cache-Control', CACHE_CONTROL)
+            self.send_header('ETag', etag)
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name='images').start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve cached WebP thumbnails with long cache headers")
+    parser.add_argument('--dir', default=DEFAULT_IMAGE_DIR, help="image cache directory")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8601)
+    args = parser.parse_args()
+
+    server = serve(args.dir, args.port, args.host)
+    print(f"Serving {args.dir} on http://{args.host}:{args.port}/<size>/<key>.webp")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+"""Load test: concurrent simulated users of app.py against a stub TMDB.
+
+Starts --workers `streamlit run app.py` server processes and drives --users
+simulated visitors through them (round-robin, as behind a load balancer).
+Each visitor speaks Streamlit's browser protocol over the session websocket
+and goes through the page like a person does, in a fresh session per flow:
+
+    open        first render (trending, featured rail)
+    search      typing the start of a title into the search box
+    recommend   picking a match and clicking "Find Similar Movies"
+
+timing every rerun until the server reports the script finished. Flows are
+repeated --flows times per user (or until --duration runs out). TMDB is
+replaced by stub_tmdb.StubTMDB with the given latency, jitter and error rate;
+the metadata cache starts empty unless --cache names a warm one, so by
+default the TMDB path is part of what's measured.
+
+Reports throughput (flows and page renders per second), p50/p95/p99 per step
+and the resident memory of every server process (sampled while the test
+runs), printed and written to JSON:
+
+    python loadtest.py --workers 2 --users 40 --flows 5 --tmdb-latency 0.1 --error-rate 0.05
+
+The load generator shares the machine with the servers; on small hosts,
+run fewer users per core than you expect to serve.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+import websockets
+from streamlit.proto.Alert_pb2 import Alert
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+from artifacts import DEFAULT_ARTIFACT_ROOT, current_version, version_dir
+from benchmark import environment, summarize
+from catalog import load_catalog
+from metadata_cache import DEFAULT_CACHE_PATH
+from stub_tmdb import StubTMDB
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+STEPS = ('open', 'search', 'recommend')
+SEARCH_LABEL = "Search for a movie:"
+MATCHES_LABEL = "Matching movies:"
+BUTTON_LABEL = "Find Similar Movies"
+
+
+class PageError(Exception):
+    """A rerun raised, or the page is missing a widget the flow needs"""
+
+
+def rss_mb(pid):
+    """Resident memory of a process in MB, from /proc (None elsewhere)"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class Server:
+    """One `streamlit run app.py` process, with its memory sampled in the background"""
+
+    def __init__(self, port, workdir, env):
+        self.port = port
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'streamlit', 'run', APP, '--server.headless', 'true',
+             '--server.port', str(port), '--browser.gatherUsageStats', 'false'],
+            cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.samples = []
+        self._stop = threading.Event()
+
+    @property
+    def url(self):
+        return f'ws://127.0.0.1:{self.port}/_stcore/stream'
+
+    def wait_ready(self, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"streamlit exited with status {self.process.returncode}")
+            try:
+                if requests.get(f'http://127.0.0.1:{self.port}/_stcore/health', timeout=1).ok:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        raise TimeoutError(f"streamlit on port {self.port} did not start within {timeout}s")
+
+    def sample_memory(self, interval=0.5):
+        def sample():
+            while not self._stop.wait(interval):
+                self.samples.append(rss_mb(self.process.pid))
+        self.samples.append(rss_mb(self.process.pid))
+        threading.Thread(target=sample, daemon=True).start()
+
+    def memory(self):
+        samples = [sample for sample in self.samples if sample is not None]
+        if not samples:
+            return {'start_mb': None, 'peak_mb': None, 'end_mb': None}
+        return {'start_mb': round(samples[0], 1), 'peak_mb': round(max(samples), 1),
+                'end_mb': round(samples[-1], 1)}
+
+    def stop(self):
+        self._stop.set()
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class Session:
+    """A browser tab: one websocket session and the widgets of its last render"""
+
+    def __init__(self, websocket, timeout):
+        self.websocket = websocket
+        self.timeout = timeout
+        self.widgets = {}  # (type, label) -> element proto
+        self.errors = 0    # st.error alerts on the last render
+
+    def widget(self, kind, label):
+        try:
+            return self.widgets[(kind, label)]
+        except KeyError:
+            raise PageError(f"no {kind} {label!r} on the page") from None
+
+    async def rerun(self, states=()):
+        """Rerun the script with these widget states; returns seconds until it finished"""
+        message = BackMsg()
+        message.rerun_script.query_string = ''
+        message.rerun_script.widget_states.widgets.extend(states)
+        start = time.perf_counter()
+        await self.websocket.send(message.SerializeToString())
+        await asyncio.wait_for(self._receive(), self.timeout)
+        return time.perf_counter() - start
+
+    async def _receive(self):
+        self.widgets, self.errors = {}, 0
+        while True:
+            message = ForwardMsg()
+            message.ParseFromString(await self.websocket.recv())
+            kind = message.WhichOneof('type')
+            if kind == 'script_finished':
+                return
+            if kind != 'delta' or message.delta.WhichOneof('type') != 'new_element':
+                continue
+            element = message.delta.new_element
+            element_type = element.WhichOneof('type')
+            if element_type == 'exception':
+                raise PageError(f"{element.exception.type}: {element.exception.message}")
+            if element_type == 'alert' and element.alert.format == Alert.ERROR:
+                self.errors += 1
+            proto = getattr(element, element_type)
+            if hasattr(proto, 'id') and hasattr(proto, 'label'):
+                self.widgets[(element_type, proto.label)] = proto
+
+
+def text_state(widget, value):
+    return WidgetState(id=widget.id, string_value=value)
+
+
+async def flow(url, title, rng, timeout):
+    """One visitor session; returns ({step: seconds}, errors shown on the last page)"""
+    async with websockets.connect(url, subprotocols=['streamlit'], max_size=None) as websocket:
+        session = Session(websocket, timeout)
+        timings = {'open': await session.rerun()}
+
+        query = text_state(session.widget('text_input', SEARCH_LABEL), title[:rng.randint(4, max(4, len(title)))])
+        timings['search'] = await session.rerun([query])
+
+        matches = session.widget('selectbox', MATCHES_LABEL)
+        button = session.widget('button', BUTTON_LABEL)
+        states = [query, WidgetState(id=button.id, trigger_value=True)]
+        if title in matches.options:
+            states.append(text_state(matches, title))
+        timings['recommend'] = await session.rerun(states)
+        return timings, session.errors
+
+
+async def drive(servers, titles, users, flows, duration, timeout, seed):
+    timings = {step: [] for step in STEPS}
+    counts = {'flows': 0, 'renders': 0, 'failed': 0, 'pages_with_errors': 0}
+    failures = []
+    deadline = time.monotonic() + duration if duration else None
+
+    async def user(i):
+        rng = random.Random(f'{seed}:{i}')
+        url = servers[i % len(servers)].url
+        done = 0
+        while (done < flows) if deadline is None else (time.monotonic() < deadline):
+            done += 1
+            try:
+                steps, errors = await flow(url, rng.choice(titles), rng, timeout)
+            except Exception as e:  # timeout, dropped connection or a broken page
+                counts['failed'] += 1
+                failures.append(f'{type(e).__name__}: {e}')
+                continue
+            for step, seconds in steps.items():
+                timings[step].append(seconds)
+            counts['flows'] += 1
+            counts['renders'] += len(steps)
+            counts['pages_with_errors'] += errors > 0
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(users)))
+    return timings, counts, failures, time.perf_counter() - start
+
+
+def run(artifacts=DEFAULT_ARTIFACT_ROOT, cache=None, workers=1, users=10, flows=3, duration=0,
+        tmdb_latency=0.1, tmdb_jitter=0.0, error_rate=0.0, timeout=60, port=8700, seed=0):
+    """Run the load test; returns the report dict"""
+    version = current_version(artifacts)
+    if version is None:
+        raise FileNotFoundError(f"No published artifacts in {artifacts!r}")
+    titles = load_catalog(version_dir(artifacts, version))['title'].tolist()
+
+    with tempfile.TemporaryDirectory(prefix='loadtest-') as workdir, \
+            StubTMDB(tmdb_latency, error_rate, seed=seed, jitter=tmdb_jitter) as stub:
+        # The servers run app.py from a scratch directory: the artifacts are
+        # linked in and the metadata cache is empty unless --cache is given
+        os.symlink(os.path.abspath(artifacts), os.path.join(workdir, DEFAULT_ARTIFACT_ROOT))
+        if cache:
+            os.symlink(os.path.abspath(cache), os.path.join(workdir, DEFAULT_CACHE_PATH))
+        env = {**os.environ, 'TMDB_API_TOKEN': 'stub-token', 'TMDB_MOVIE_URL': stub.movie_url}
+        env.pop('RECOMMENDER_URL', None)
+
+        servers = [Server(port + i, workdir, env) for i in range(workers)]
+        try:
+            startup = {'ready': [], 'first_flow': []}
+            for server in servers:
+                start = time.perf_counter()
+                server.wait_ready()
+                startup['ready'].append(time.perf_counter() - start)
+            # First render per process loads the recommender; timed, but not part of the run
+            for server in servers:
+                start = time.perf_counter()
+                asyncio.run(flow(server.url, titles[0], random.Random(seed), timeout))
+                startup['first_flow'].append(time.perf_counter() - start)
+                server.sample_memory()
+            requests_before, errors_before = stub.requests, stub.errors
+            timings, counts, failures, elapsed = asyncio.run(
+                drive(servers, titles, users, flows, duration, timeout, seed))
+            stub_stats = {'requests': stub.requests - requests_before, 'errors': stub.errors - errors_before}
+        finally:
+            for server in servers:
+                server.stop()
+
+    return {
+        'counts': counts,
+        'elapsed_s': round(elapsed, 2),
+        'throughput': {
+            'flows_per_s': round(counts['flows'] / elapsed, 2),
+            'renders_per_s': round(counts['renders'] / elapsed, 2),
+        },
+        'steps': {step: summarize(timings[step]) for step in STEPS if timings[step]},
+        'startup': {stage: summarize(seconds) for stage, seconds in startup.items()},
+        'workers': [{'port': server.port, **server.memory()} for server in servers],
+        'failures': failures[:10],
+        'stub': stub_stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent app.py users against a stub TMDB")
+    parser.add_argument('--artifacts', default=DEFAULT_ARTIFACT_ROOT, help="artifact root the app serves")
+    parser.add_argument('--cache', help="existing metadata cache to start from (default: empty)")
+    parser.add_argument('--workers', type=int, default=1, help="streamlit server processes")
+    parser.add_argument('--users', type=int, default=10, help="concurrent simulated users in total")
+    parser.add_argument('--flows', type=int, default=3, help="search -> recommend flows per user")
+    parser.add_argument('--duration', type=float, default=0, help="run for N seconds instead of --flows")
+    parser.add_argument('--tmdb-latency', type=float, default=0.1, help="stub TMDB latency in seconds")
+    parser.add_argument('--tmdb-jitter', type=float, default=0.0, help="extra random latency, up to N seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of stub requests failing with 503")
+    parser.add_argument('--timeout', type=float, default=60, help="seconds allowed per page render")
+    parser.add_argument('--port', type=int, default=8700, help="first server port")
+    parser.add_argument('--output', default='loadtest.json', help="JSON results file")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    report = run(args.artifacts, args.cache, args.workers, args.users, args.flows, args.duration,
+                 args.tmdb_latency, args.tmdb_jitter, args.error_rate, args.timeout, args.port, args.seed)
+    report = {'environment': environment(), 'params': vars(args), **report}
+
+    counts, throughput = report['counts'], report['throughput']
+    print(f"{args.workers} server(s), {args.users} users: {counts['flows']} flows ({counts['failed']} failed, "
+          f"{counts['pages_with_errors']} showing TMDB errors) in {report['elapsed_s']:.1f}s, "
+          f"{throughput['flows_per_s']:.2f} flows/s, {throughput['renders_per_s']:.2f} renders/s")
+    for step, summary in report['steps'].items():
+        print(f"  {step:<10} p50 {summary['p50_ms']:>8.0f} ms  p95 {summary['p95_ms']:>8.0f} ms  "
+              f"p99 {summary['p99_ms']:>8.0f} ms")
+    for worker in report['workers']:
+        print(f"  server :{worker['port']}  {worker['start_mb']} MB after warm-up, "
+              f"peak {worker['peak_mb']} MB, end {worker['end_mb']} MB")
+    print(f"  stub TMDB: {report['stub']['requests']} requests, {report['stub']['errors']} injected errors")
+    for failure in report['failures'][:3]:
+        print(f"  failed: {failure}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
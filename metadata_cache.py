@@ -0,0 +1,140 @@
+"""Persistent TMDB metadata cache shared by all worker processes on a host.
+
+Details are stored as JSON in a single SQLite file in WAL mode, so several
+Streamlit processes can read concurrently while one writes, and the cache
+survives restarts. Entries expire after `ttl` seconds and the table is kept
+under `max_entries` rows by dropping the oldest fetches first. Expired entries
+keep their ETag / Last-Modified validators so a refresh can be a cheap
+conditional request.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = 'tmdb_cache.sqlite'
+EVICT_EVERY = 256  # writes between size checks
+SCHEMA_VERSION = 2  # bump to discard caches written by an older layout
+
+
+class MetadataCache:
+    """movie_id -> details dict, persisted in SQLite"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=7 * 24 * 3600, max_entries=200_000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()  # sqlite connections are per thread
+        self._writes = 0
+        self._create_schema()
+
+    def _create_schema(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                # It is only a cache: start over rather than migrate
+                conn.execute("DROP TABLE IF EXISTS movies")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS movies ("
+                " movie_id INTEGER PRIMARY KEY,"
+                " details TEXT NOT NULL,"
+                " fetched_at REAL NOT NULL,"
+                " etag TEXT,"
+                " last_modified TEXT)"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, movie_ids, stale=False):
+        """Fresh (or, with stale=True, any) cached details for the given ids, as {movie_id: details}"""
+        ids = [int(movie_id) for movie_id in movie_ids]
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        rows = self._connect().execute(
+            f"SELECT movie_id, details FROM movies WHERE fetched_at >= ? AND movie_id IN ({placeholders})",
+            [0 if stale else time.time() - self.ttl, *ids],
+        )
+        return {movie_id: json.loads(details) for movie_id, details in rows}
+
+    def get(self, movie_id):
+        """Fresh cached details for one movie, or None"""
+        return self.get_many([movie_id]).get(int(movie_id))
+
+    def get_entry(self, movie_id):
+        """Cached entry for one movie even if expired, with its HTTP validators.
+
+        Returns a dict with `details`, `etag`, `last_modified` and `fresh`, or
+        None when the movie was never cached.
+        """
+        row = self._connect().execute(
+            "SELECT details, fetched_at, etag, last_modified FROM movies WHERE movie_id = ?",
+            (int(movie_id),),
+        ).fetchone()
+        if row is None:
+            return None
+        details, fetched_at, etag, last_modified = row
+        return {
+            'details': json.loads(details),
+            'etag': etag,
+            'last_modified': last_modified,
+            'fresh': fetched_at >= time.time() - self.ttl,
+        }
+
+    def _write(self, rows):
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT OR REPLACE INTO movies (movie_id, details, fetched_at, etag, last_modified)"
+                " VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+        self._writes += len(rows)
+        if self._writes >= EVICT_EVERY:
+            self._writes = 0
+            self.evict()
+
+    def put_many(self, items):
+        """Store {movie_id: details} in one transaction"""
+        now = time.time()
+        self._write([(int(movie_id), json.dumps(details), now, None, None)
+                     for movie_id, details in items.items()])
+
+    def put(self, movie_id, details, etag=None, last_modified=None):
+        """Store one movie together with the response's cache validators"""
+        self._write([(int(movie_id), json.dumps(details), time.time(), etag, last_modified)])
+
+    def touch(self, movie_id):
+        """Mark an entry fresh again after a 304 Not Modified revalidation"""
+        conn = self._connect()
+        with conn:
+            conn.execute("UPDATE movies SET fetched_at = ? WHERE movie_id = ?", (time.time(), int(movie_id)))
+
+    def evict(self):
+        """Drop the oldest entries beyond max_entries"""
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "DELETE FROM movies WHERE movie_id IN ("
+                " SELECT movie_id FROM movies ORDER BY fetched_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def stats(self):
+        """Entry counts for the warm-up report"""
+        total, fresh = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(fetched_at >= ?), 0) FROM movies",
+            (time.time() - self.ttl,),
+        ).fetchone()
+        return {'entries': total, 'fresh': fresh, 'stale': total - fresh}
@@ -0,0 +1,186 @@
+"""Per-stage latency histograms and request traces.
+
+Code under measurement wraps each stage in `span(name)`:
+
+    with metrics.span('rank'):
+        rows, scores = index.neighbors(row, k)
+
+Every span feeds a latency histogram (`recommender_stage_seconds`, labelled
+by stage), and, inside a `trace()` block, is also appended to that block's
+span list so one page view can be broken down. A span costs two
+perf_counter calls, a bisect and a short locked update, so it stays on in
+production. `render()` returns all histograms in the Prometheus text format;
+service.py serves it on /metrics and app.py on METRICS_PORT.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds in seconds, 100us .. 30s
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_trace = ContextVar('trace', default=None)
+
+
+class Histogram:
+    """Cumulative latency histogram with Prometheus semantics"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        slot = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[slot] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+    def quantile(self, q):
+        """Approximate quantile: upper bound of the bucket holding it"""
+        counts, _, count = self.snapshot()
+        if not count:
+            return 0.0
+        seen = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            seen += bucket_count
+            if seen >= q * count:
+                return bound
+        return float('inf')
+
+
+class Registry:
+    """Histograms per (metric name, label value) and counters"""
+
+    def __init__(self):
+        self.histograms = {}  # (name, help, label, value) -> Histogram
+        self.counters = {}    # (name, help, label, value) -> int
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help_text, label, value):
+        key = (name, help_text, label, value)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(key, Histogram())
+        return histogram
+
+    def inc(self, name, help_text, label, value, amount=1):
+        key = (name, help_text, label, value)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        described = set()
+        for (name, help_text, label, value), histogram in sorted(self.histograms.items()):
+            if name not in described:
+                described.add(name)
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+            counts, total, count = histogram.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{{label}="{value}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{label}="{value}"}} {total:.6f}')
+            lines.append(f'{name}_count{{{label}="{value}"}} {count}')
+        for (name, help_text, label, value), count in sorted(self.counters.items()):
+            if name not in described:
+                described.add(name)
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            lines.append(f'{name}{{{label}="{value}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def observe(stage, seconds):
+    """Record one stage duration into the stage histogram and the current trace, if any"""
+    REGISTRY.histogram('recommender_stage_seconds', 'Latency of each serving stage', 'stage',
+                       stage).observe(seconds)
+    spans = _trace.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+@contextmanager
+def span(stage):
+    """Time the enclosed block as one stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def trace():
+    """Collect the (stage, seconds) spans of the enclosed block into a list"""
+    spans = []
+    token = _trace.set(spans)
+    try:
+        yield spans
+    finally:
+        _trace.reset(token)
+
+
+def begin_trace():
+    """Start collecting spans for the rest of the current context (one Streamlit run)"""
+    spans = []
+    _trace.set(spans)
+    return spans
+
+
+def count(name, help_text, label, value, amount=1):
+    REGISTRY.inc(name, help_text, label, value, amount)
+
+
+def render():
+    return REGISTRY.render()
+
+
+def stage_summary():
+    """{stage: {'count', 'mean_ms', 'p95_ms'}} for the debug panel"""
+    summary = {}
+    for (name, _, _, stage), histogram in sorted(REGISTRY.histograms.items()):
+        if name == 'recommender_stage_seconds':
+            _, total, n = histogram.snapshot()
+            summary[stage] = {'count': n, 'mean_ms': 1000 * total / n if n else 0.0,
+                              'p95_ms': 1000 * histogram.quantile(0.95)}
+    return summary
+
+
+def serve(port, host='0.0.0.0'):
+    """Serve /metrics from a background thread (for processes without their own HTTP server)"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            found = self.path.split('?')[0] == '/metrics'
+            body = render().encode('utf-8') if found else b''
+            self.send_response(200 if found else 404)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name='metrics').start()
+    return server
@@ -0,0 +1,169 @@
+"""Compact top-K neighbor index for the recommender.
+
+Instead of keeping the full N x N cosine similarity matrix in memory, we store
+only the K most similar movies for every row: an int32 array of neighbor rows
+and a float32 array of their scores. Memory and load time are O(N*K).
+
+A neighbor backend is anything with a `neighbors(row, k)` method returning
+(rows, scores); `load_backend` picks the exact precomputed index, the
+approximate IVF index from ann.py or the reduced embeddings from embeddings.py.
+"""
+import numpy as np
+
+from artifacts import load_array, save_array
+
+DEFAULT_K = 50  # neighbors kept per movie in the offline index
+AGGREGATES = ('mean', 'max', 'weighted')  # ways to combine several seed movies
+BACKENDS = ('exact', 'ivf', 'embedding', 'embedding-int8')
+
+
+class NeighborIndex:
+    """Top-K neighbor rows and scores for every movie, sorted by descending score"""
+
+    def __init__(self, ids, scores):
+        self.ids = ids
+        self.scores = scores
+
+    def __len__(self):
+        return self.ids.shape[0]
+
+    @property
+    def k(self):
+        return self.ids.shape[1]
+
+    def neighbors(self, row, k=5):
+        """Return the (rows, scores) of the k nearest neighbors of a movie row"""
+        ids, scores = self.ids[row], self.scores[row]
+        keep = ids != row  # never recommend the query movie itself
+        return ids[keep][:k], scores[keep][:k]
+
+
+def top_k(scores, k, exclude=None):
+    """Return the (indices, scores) of the k largest scores, best first.
+
+    `scores` is a single row or a 2-D block of rows. `exclude` gives, per row,
+    an index that must never be returned (usually the query movie). Uses a
+    partial selection, so the cost is O(N + k log k) per row instead of a
+    full O(N log N) sort.
+    """
+    single = np.ndim(scores) == 1
+    block = np.array(np.atleast_2d(scores), dtype=np.float32)
+    rows = np.arange(block.shape[0])
+    if exclude is not None:
+        block[rows, np.atleast_1d(exclude)] = -np.inf
+
+    n = block.shape[1] - (exclude is not None)
+    k = max(0, min(k, n))
+    if k == 0:
+        empty = np.empty((block.shape[0], 0))
+        ids, best = empty.astype(np.int32), empty.astype(np.float32)
+    else:
+        candidates = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(block, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind='stable')
+        ids = np.take_along_axis(candidates, order, axis=1).astype(np.int32)
+        best = np.take_along_axis(candidate_scores, order, axis=1)
+
+    if single:
+        return ids[0], best[0]
+    return ids, best
+
+
+def neighbors_many(index, rows, k):
+    """(ids, scores) arrays of shape (len(rows), k) for many seed rows.
+
+    A NeighborIndex answers with one fancy-indexing gather; other backends are
+    queried row by row. Missing slots are padded with id -1 and score -inf.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    if isinstance(index, NeighborIndex) and k <= index.k:
+        # Stored lists never contain the movie itself, so the first k are the answer
+        return np.asarray(index.ids[rows, :k]), np.asarray(index.scores[rows, :k])
+
+    ids = np.full((len(rows), k), -1, dtype=np.int32)
+    scores = np.full((len(rows), k), -np.inf, dtype=np.float32)
+    for i, row in enumerate(rows):
+        row_ids, row_scores = index.neighbors(row, k)
+        ids[i, :len(row_ids)] = row_ids
+        scores[i, :len(row_scores)] = row_scores
+    return ids, scores
+
+
+def check_weights(weights, n_seeds):
+    """Seed weights as a float32 array; raises ValueError unless usable for a weighted mean"""
+    weights = np.asarray(weights, dtype=np.float32)
+    if weights.shape != (n_seeds,):
+        raise ValueError("give one weight per seed")
+    if not np.isfinite(weights).all() or (weights < 0).any() or weights.sum() <= 0:
+        raise ValueError("weights must be finite, non-negative and not all zero")
+    return weights
+
+
+def aggregate_seeds(index, rows, k, method='mean', weights=None, depth=None):
+    """Top-k (ids, scores) for a set of seeds taken together.
+
+    Each seed contributes its `depth` nearest neighbors (default 4k); a
+    candidate missing from a seed's list counts as similarity 0 to it. Seeds
+    themselves are never returned.
+    """
+    if method not in AGGREGATES:
+        raise ValueError(f"Unknown aggregate {method!r}, expected one of {AGGREGATES}")
+    if method == 'weighted':
+        weights = np.ones(len(rows), dtype=np.float32) if weights is None else check_weights(weights, len(rows))
+    ids, scores = neighbors_many(index, rows, depth or 4 * k)
+    valid = ids >= 0
+    candidates, inverse = np.unique(ids[valid], return_inverse=True)
+    matrix = np.zeros((len(rows), len(candidates)), dtype=np.float32)
+    matrix[np.nonzero(valid)[0], inverse] = scores[valid]
+
+    if method == 'max':
+        combined = matrix.max(axis=0)
+    elif method == 'weighted':
+        combined = weights @ matrix / weights.sum()
+    else:
+        combined = matrix.mean(axis=0)
+
+    combined[np.isin(candidates, rows)] = -np.inf
+    best, best_scores = top_k(combined, k)
+    keep = np.isfinite(best_scores)
+    return candidates[best][keep], best_scores[keep]
+
+
+def build_neighbor_index(similarity, k=DEFAULT_K, block_size=1024):
+    """Reduce a dense similarity matrix to a NeighborIndex, one row block at a time"""
+    n = similarity.shape[0]
+    k = min(k, n - 1)
+    ids = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        ids[start:stop], scores[start:stop] = top_k(
+            similarity[start:stop], k, exclude=np.arange(start, stop)
+        )
+
+    return NeighborIndex(ids, scores)
+
+
+def save_neighbor_index(index, path):
+    """Write the index into an artifact version directory as two .npy arrays"""
+    save_array(path, 'neighbor_ids', index.ids)
+    save_array(path, 'neighbor_scores', index.scores)
+
+
+def load_neighbor_index(path):
+    """Memory-map an index written by save_neighbor_index"""
+    return NeighborIndex(load_array(path, 'neighbor_ids'), load_array(path, 'neighbor_scores'))
+
+
+def load_backend(artifact_dir, name='exact', n_probe=8):
+    """Neighbor backend for an artifact directory: one of BACKENDS, 'exact' by default"""
+    if name == 'exact':
+        return load_neighbor_index(artifact_dir)
+    if name == 'ivf':
+        from ann import load_ivf  # needs scipy; only imported when asked for
+        return load_ivf(artifact_dir, n_probe)
+    if name in ('embedding', 'embedding-int8'):
+        from embeddings import load_embedding_index
+        return load_embedding_index(artifact_dir, quantized=name == 'embedding-int8')
+    raise ValueError(f"Unknown neighbor backend: {name}")
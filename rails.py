@@ -0,0 +1,179 @@
+"""Precomputed "featured" and "trending" rails.
+
+A scheduled job (cron, or `--every`) ranks the catalog by the TMDB metadata
+already in the SQLite cache and writes the best candidates of each rail, with
+their details, to `<artifact root>/rails.json`:
+
+* featured: weighted rating, so a 9.0 from 20 votes doesn't beat a 8.3 from
+  20,000 (IMDb's v / (v + m) * R + m / (v + m) * C);
+* trending: recent releases by vote count, topped up with all-time vote
+  count when the catalog has few recent movies.
+
+Serving processes load the file into a RailStore and pick each rail's movies
+from the candidate pool once per time bucket, so every session in a bucket
+sees the same rail, straight from memory, without TMDB calls.
+
+Usage:
+    python rails.py --artifacts artifacts --cache tmdb_cache.sqlite --pool 100
+    python rails.py --every 3600    # keep rebuilding hourly
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from datetime import date
+
+from artifacts import DEFAULT_ARTIFACT_ROOT, current_version, version_dir
+from catalog import load_catalog
+from metadata_cache import DEFAULT_CACHE_PATH, MetadataCache
+
+RAILS_FILE = 'rails.json'
+RAILS = ('featured', 'trending')
+DEFAULT_BUCKET_SECONDS = 6 * 3600
+RECENT_YEARS = 3
+
+
+def _year(details):
+    try:
+        return int(details.get('year'))
+    except (TypeError, ValueError):
+        return None
+
+
+def build_rails(movies, details, pool_size=100, min_votes=None, recent_years=RECENT_YEARS, today=None):
+    """{rail: [item, ...]} candidate pools ranked from cached details.
+
+    `movies` is the catalog DataFrame and `details` maps movie_id to cached
+    TMDB details; movies without details are skipped.
+    """
+    items = [
+        {'title': title, 'id': int(movie_id), 'details': details[int(movie_id)]}
+        for movie_id, title in zip(movies['movie_id'], movies['title'])
+        if int(movie_id) in details
+    ]
+    if not items:
+        return {rail: [] for rail in RAILS}
+
+    votes = sorted(item['details'].get('vote_count') or 0 for item in items)
+    if min_votes is None:
+        min_votes = votes[int(0.8 * (len(votes) - 1))]  # 80th percentile, as IMDb's top lists do
+    rated = [item for item in items if item['details'].get('vote_count')]
+    mean = (sum(item['details']['rating'] for item in rated) / len(rated)) if rated else 0
+
+    def weighted_rating(item):
+        v, r = item['details'].get('vote_count') or 0, item['details'].get('rating') or 0
+        return v / (v + min_votes) * r + min_votes / (v + min_votes) * mean if v + min_votes else 0
+
+    def vote_count(item):
+        return item['details'].get('vote_count') or 0
+
+    featured = sorted(items, key=weighted_rating, reverse=True)[:pool_size]
+    this_year = (today or date.today()).year
+    recent = [item for item in items if (_year(item['details']) or 0) >= this_year - recent_years]
+    trending = sorted(recent, key=vote_count, reverse=True)[:pool_size]
+    if len(trending) < pool_size:
+        chosen = {item['id'] for item in trending}
+        trending += [item for item in sorted(items, key=vote_count, reverse=True)
+                     if item['id'] not in chosen][:pool_size - len(trending)]
+    return {'featured': featured, 'trending': trending}
+
+
+def save_rails(root, rails, version, bucket_seconds=DEFAULT_BUCKET_SECONDS):
+    """Atomically write rails.json under the artifact root"""
+    bucket_seconds = max(1, int(bucket_seconds))  # RailStore divides by it
+    path = os.path.join(root, RAILS_FILE)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'version': version, 'built_at': time.time(), 'bucket_seconds': bucket_seconds,
+                   'rails': rails}, f)
+    os.replace(tmp, path)
+
+
+def pick(pool, n, seed):
+    """n movies of a pool, the same for everyone with the same seed"""
+    return random.Random(seed).sample(pool, min(n, len(pool)))
+
+
+class RailStore:
+    """rails.json held in memory, re-read when the file changes"""
+
+    def __init__(self, root=DEFAULT_ARTIFACT_ROOT, check_interval=60):
+        self.path = os.path.join(root, RAILS_FILE)
+        self.check_interval = check_interval
+        self._data = None
+        self._mtime = None
+        self._checked_at = 0
+        self._picks = {}  # (rail, n, bucket) -> items
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            self._data, self._mtime, self._picks = None, None, {}
+            return
+        if mtime != self._mtime:
+            with open(self.path) as f:
+                self._data = json.load(f)
+            self._mtime, self._picks = mtime, {}
+
+    def rail(self, name, n, now=None):
+        """Items of a rail for the current time bucket, or None without rails.json"""
+        with self._lock:
+            self._refresh()
+            if self._data is None or not self._data['rails'].get(name):
+                return None
+            bucket = int((now or time.time()) // max(1, self._data['bucket_seconds']))
+            key = (name, n, bucket)
+            if key not in self._picks:
+                self._picks[key] = pick(self._data['rails'][name], n, f'{name}:{bucket}')
+            return [dict(item) for item in self._picks[key]]
+
+
+def run(root=DEFAULT_ARTIFACT_ROOT, cache_path=DEFAULT_CACHE_PATH, pool_size=100,
+        bucket_seconds=DEFAULT_BUCKET_SECONDS, batch_size=500):
+    """Rebuild rails.json for the published version; returns pool sizes per rail"""
+    version = current_version(root)
+    if version is None:
+        raise FileNotFoundError(f"No published artifacts in {root!r}")
+    movies = load_catalog(version_dir(root, version))
+    cache = MetadataCache(cache_path)
+    movie_ids = [int(movie_id) for movie_id in movies['movie_id']]
+    details = {}
+    for offset in range(0, len(movie_ids), batch_size):
+        details.update(cache.get_many(movie_ids[offset:offset + batch_size], stale=True))
+    rails = build_rails(movies, details, pool_size)
+    save_rails(root, rails, version, bucket_seconds)
+    return {name: len(pool) for name, pool in rails.items()}, len(details), len(movie_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the featured / trending rails from cached metadata")
+    parser.add_argument('--artifacts', default=DEFAULT_ARTIFACT_ROOT, help="artifact root (rails.json goes here)")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help="SQLite metadata cache filled by warm_cache.py")
+    parser.add_argument('--pool', type=int, default=100, help="candidates kept per rail")
+    parser.add_argument('--bucket-minutes', type=float, default=DEFAULT_BUCKET_SECONDS / 60,
+                        help="how long one rail selection is shown")
+    parser.add_argument('--every', type=float, default=0, help="rebuild every N seconds instead of once")
+    args = parser.parse_args()
+    if args.bucket_minutes * 60 < 1:
+        parser.error("--bucket-minutes must be at least one second (1/60)")
+
+    while True:
+        start = time.perf_counter()
+        pools, known, total = run(args.artifacts, args.cache, args.pool, int(args.bucket_minutes * 60))
+        print(f"Built rails {pools} from {known}/{total} movies with cached metadata "
+              f"in {time.perf_counter() - start:.1f}s")
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Hybrid re-ranking of content neighbors with movie metadata.
+
+The content index returns a wide candidate set (up to CANDIDATES movies by
+cosine similarity). The Reranker re-scores it with metadata held in columnar
+arrays next to the other artifacts:
+
+    feature_popularity.npy   TMDB popularity
+    feature_vote_average.npy / feature_vote_count.npy
+    feature_year.npy         release year (0 when unknown)
+    feature_genres.npy       N x G uint8 genre indicator matrix
+    genre_names.npy          the G genre names
+
+Popularity, weighted rating and recency are folded into one per-movie prior
+when the artifacts are loaded, so a request only adds prior[candidates] to
+the similarities and then picks k movies with maximal marginal relevance
+(MMR) over genre overlap, which keeps a rail from being five films of the
+same genre. Everything is vectorized over the candidates; a request costs
+well under a millisecond.
+"""
+import os
+from datetime import date
+
+import numpy as np
+
+from artifacts import load_array, load_strings, save_array, save_strings
+
+CANDIDATES = 100
+FEATURE_COLUMNS = ['popularity', 'vote_average', 'vote_count', 'year', 'genre_names']
+DEFAULT_WEIGHTS = {'popularity': 0.08, 'quality': 0.08, 'recency': 0.04}
+DIVERSITY = 0.3        # MMR trade-off: 0 = relevance only, 1 = diversity only
+RECENCY_HALF_LIFE = 10  # years
+
+
+def encode_features(movies, genre_names=None):
+    """Columnar feature arrays from a DataFrame with FEATURE_COLUMNS.
+
+    `genre_names` fixes the genre columns (as in an incremental update);
+    genres outside it are ignored. By default every genre seen is used.
+    """
+    if genre_names is None:
+        genre_names = sorted({name for names in movies['genre_names'] for name in names})
+    column = {name: i for i, name in enumerate(genre_names)}
+    genres = np.zeros((len(movies), len(genre_names)), dtype=np.uint8)
+    for row, names in enumerate(movies['genre_names']):
+        for name in names:
+            if name in column:
+                genres[row, column[name]] = 1
+    return {
+        'popularity': movies['popularity'].fillna(0).to_numpy(dtype=np.float32),
+        'vote_average': movies['vote_average'].fillna(0).to_numpy(dtype=np.float32),
+        'vote_count': movies['vote_count'].fillna(0).to_numpy(dtype=np.int32),
+        'year': movies['year'].fillna(0).to_numpy(dtype=np.int16),
+        'genres': genres,
+        'genre_names': list(genre_names),
+    }
+
+
+def concat_features(first, second):
+    """Row-wise concatenation of two feature sets sharing genre columns"""
+    merged = {name: np.concatenate([first[name], second[name]]) for name in first if name != 'genre_names'}
+    merged['genre_names'] = first['genre_names']
+    return merged
+
+
+def select_features(features, rows):
+    selected = {name: np.asarray(values)[rows] for name, values in features.items() if name != 'genre_names'}
+    selected['genre_names'] = features['genre_names']
+    return selected
+
+
+def save_features(path, features):
+    for name, values in features.items():
+        if name != 'genre_names':
+            save_array(path, f'feature_{name}', values)
+    save_strings(path, 'genre_names', features['genre_names'])
+
+
+def has_features(path):
+    return os.path.exists(os.path.join(path, 'feature_genres.npy'))
+
+
+def load_features(path):
+    features = {name: load_array(path, f'feature_{name}')
+                for name in ('popularity', 'vote_average', 'vote_count', 'year', 'genres')}
+    features['genre_names'] = load_strings(path, 'genre_names')
+    return features
+
+
+def movie_prior(features, weights=DEFAULT_WEIGHTS, this_year=None):
+    """Per-movie metadata score in [0, sum(weights)]"""
+    popularity = np.log1p(np.asarray(features['popularity'], dtype=np.float32))
+    popularity /= max(float(popularity.max()), 1e-9)
+
+    votes = np.asarray(features['vote_count'], dtype=np.float32)
+    rating = np.asarray(features['vote_average'], dtype=np.float32)
+    min_votes = float(np.percentile(votes, 80)) if len(votes) else 0
+    mean = float(rating[votes > 0].mean()) if (votes > 0).any() else 0
+    quality = (votes * rating + min_votes * mean) / np.maximum(votes + min_votes, 1) / 10
+
+    year = np.asarray(features['year'], dtype=np.float32)
+    age = np.maximum((this_year or date.today().year) - year, 0)
+    recency = np.where(year > 0, 0.5 ** (age / RECENCY_HALF_LIFE), 0).astype(np.float32)
+
+    return (weights['popularity'] * popularity + weights['quality'] * quality
+            + weights['recency'] * recency).astype(np.float32)
+
+
+class Reranker:
+    """Similarity + metadata prior, diversified over genres with MMR"""
+
+    def __init__(self, features, weights=DEFAULT_WEIGHTS, diversity=DIVERSITY, candidates=CANDIDATES):
+        self.prior = movie_prior(features, weights)
+        self.genres = np.asarray(features['genres'], dtype=np.float32)
+        self.genre_counts = self.genres.sum(axis=1)
+        self.diversity = diversity
+        self.candidates = candidates
+
+    def rerank(self, rows, scores, k):
+        """(rows, similarity scores) of the k best candidates, in re-ranked order"""
+        rows = np.asarray(rows)
+        if len(rows) <= 1:
+            return rows[:k], np.asarray(scores)[:k]
+        relevance = np.asarray(scores, dtype=np.float32) + self.prior[rows]
+        if not self.diversity or not self.genres.shape[1]:
+            order = np.argsort(-relevance, kind='stable')[:k]
+            return rows[order], np.asarray(scores)[order]
+
+        # Genre Jaccard between every pair of candidates
+        genres = self.genres[rows]
+        counts = self.genre_counts[rows]
+        overlap = genres @ genres.T
+        union = counts[:, None] + counts[None, :] - overlap
+        similarity = np.divide(overlap, union, out=np.zeros_like(overlap), where=union > 0)
+
+        chosen = [int(np.argmax(relevance))]
+        redundancy = similarity[chosen[0]].copy()
+        available = np.ones(len(rows), dtype=bool)
+        available[chosen[0]] = False
+        for _ in range(min(k, len(rows)) - 1):
+            mmr = (1 - self.diversity) * relevance - self.diversity * redundancy
+            mmr[~available] = -np.inf
+            best = int(np.argmax(mmr))
+            chosen.append(best)
+            available[best] = False
+            np.maximum(redundancy, similarity[best], out=redundancy)
+        return rows[chosen], np.asarray(scores)[chosen]
@@ -0,0 +1,136 @@
+"""In-memory cache of finished recommendation results.
+
+Popular titles are requested over and over, and each request costs a neighbor
+lookup plus TMDB enrichment. `ResultCache` keeps the finished, enriched result
+keyed by the request (movie row, K, ...) and the artifact version it was
+computed from. Entries from an older version are dropped as soon as a result
+for a newer version is looked up, so publishing new artifacts invalidates the
+cache without any coordination.
+
+Eviction is LRU or LFU (with LRU among equally frequent entries), both O(1).
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+POLICIES = ('lru', 'lfu')
+
+
+class ResultCache:
+    """Thread-safe bounded result cache with hit/miss counters"""
+
+    def __init__(self, max_entries=1024, policy='lru', ttl=3600):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {', '.join(POLICIES)}")
+        self.max_entries = max_entries
+        self.policy = policy
+        self.ttl = ttl  # enriched details go stale eventually even without a new version
+        self.version = None
+        self._lock = threading.Lock()
+        self._entries = {}                       # key -> (value, stored_at)
+        self._recent = OrderedDict()             # LRU order
+        self._counts = {}                        # LFU: key -> use count
+        self._buckets = defaultdict(OrderedDict)  # LFU: use count -> keys in LRU order
+        self._min_count = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def _sync(self, version):
+        """Drop everything computed from another artifact version"""
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._clear()
+            self.version = version
+
+    def _clear(self):
+        self._entries.clear()
+        self._recent.clear()
+        self._counts.clear()
+        self._buckets.clear()
+        self._min_count = 0
+
+    def _use(self, key):
+        if self.policy == 'lru':
+            self._recent[key] = None
+            self._recent.move_to_end(key)
+            return
+        count = self._counts.get(key, 0)
+        if count:
+            del self._buckets[count][key]
+            if not self._buckets[count]:
+                del self._buckets[count]
+                if self._min_count == count:
+                    self._min_count = count + 1
+        else:
+            self._min_count = 1
+        self._counts[key] = count + 1
+        self._buckets[count + 1][key] = None
+
+    def _forget(self, key):
+        del self._entries[key]
+        if self.policy == 'lru':
+            del self._recent[key]
+            return
+        count = self._counts.pop(key)
+        del self._buckets[count][key]
+        if not self._buckets[count]:
+            del self._buckets[count]
+            if self._min_count == count:
+                self._min_count = min(self._buckets, default=0)
+
+    def _evict(self):
+        if self.policy == 'lru':
+            key = next(iter(self._recent))
+        else:
+            key = next(iter(self._buckets[self._min_count]))
+        self._forget(key)
+        self.evictions += 1
+
+    def get(self, key, version):
+        """Cached value for `key` under `version`, or None"""
+        with self._lock:
+            self._sync(version)
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] > self.ttl:
+                self._forget(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._use(key)
+            return entry[0]
+
+    def put(self, key, version, value):
+        if self.max_entries <= 0:  # a zero-size cache stores nothing
+            return
+        with self._lock:
+            self._sync(version)
+            if key in self._entries:
+                self._forget(key)
+            elif len(self._entries) >= self.max_entries:
+                self._evict()
+            self._entries[key] = (value, time.time())
+            self._use(key)
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'policy': self.policy,
+                'version': self.version,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,104 @@
+"""Server-side typeahead search over movie titles.
+
+Built once per process from the catalog titles. A query is answered from two
+structures whose lookups are bounded no matter how large the catalog is
+(beyond O(log N) binary searches):
+
+* a sorted array of every word-start suffix of every normalized title
+  ("the dark knight", "dark knight", "knight"), searched with bisect for
+  prefix matches;
+* an inverted index of character trigrams, ranked by Jaccard similarity,
+  which makes the search tolerant to typos ("godfater" -> "The Godfather").
+  Only trigrams found in at most MAX_POSTINGS titles propose candidates;
+  common ones ("the", " th") are just binary-searched for those candidates,
+  so a query made only of common trigrams gets prefix matches only.
+
+Exact matches rank first, then title prefixes, word prefixes and finally
+fuzzy matches; ties go to shorter titles. Duplicate titles are listed once.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+
+import numpy as np
+
+from catalog import normalize_title
+from neighbors import top_k
+
+MIN_SIMILARITY = 0.3  # trigram Jaccard needed for a fuzzy match
+PREFIX_SCAN = 20      # prefix candidates scanned per requested result
+MAX_POSTINGS = 500    # titles a trigram may appear in and still propose fuzzy candidates
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleSearch:
+    """Ranked, paginated prefix + trigram search over a list of titles"""
+
+    def __init__(self, titles):
+        self._normalized = [normalize_title(title) for title in titles]
+
+        suffixes = []
+        for row, text in enumerate(self._normalized):
+            words = text.split(' ')
+            suffixes.extend((' '.join(words[i:]), row) for i in range(len(words)))
+        suffixes.sort()
+        self._suffixes = [suffix for suffix, _ in suffixes]
+        self._suffix_rows = np.array([row for _, row in suffixes], dtype=np.int32)
+
+        postings = defaultdict(list)
+        gram_counts = np.empty(len(self._normalized), dtype=np.int32)
+        for row, text in enumerate(self._normalized):
+            grams = trigrams(text)
+            gram_counts[row] = len(grams)
+            for gram in grams:
+                postings[gram].append(row)
+        self._postings = {gram: np.array(rows, dtype=np.int32) for gram, rows in postings.items()}
+        self._gram_counts = gram_counts
+
+    def _prefix_matches(self, query, limit):
+        """{row: score} for titles containing a word that starts with the query"""
+        lo = bisect_left(self._suffixes, query)
+        hi = bisect_left(self._suffixes, query + '\uffff', lo)
+        matches = {}
+        for row in self._suffix_rows[lo:min(hi, lo + limit)]:
+            text = self._normalized[row]
+            score = 3.0 if text == query else 2.0 if text.startswith(query) else 1.5
+            matches[int(row)] = max(score, matches.get(int(row), 0))
+        return matches
+
+    def _fuzzy_matches(self, query, limit):
+        """{row: Jaccard similarity} of the closest titles by shared trigrams"""
+        grams = trigrams(query)
+        lists = [self._postings[gram] for gram in grams if gram in self._postings]
+        rare = [rows for rows in lists if len(rows) <= MAX_POSTINGS]
+        if not rare:
+            return {}
+        rows, shared = np.unique(np.concatenate(rare), return_counts=True)
+        # Common trigrams only count for the candidates (postings are sorted by row)
+        for common in lists:
+            if len(common) > MAX_POSTINGS:
+                found = common[np.minimum(np.searchsorted(common, rows), len(common) - 1)]
+                shared += found == rows
+        similarity = shared / (len(grams) + self._gram_counts[rows] - shared)
+        best, best_scores = top_k(similarity, limit)
+        return {int(rows[i]): float(score) for i, score in zip(best, best_scores) if score >= MIN_SIMILARITY}
+
+    def search(self, query, limit=10, offset=0):
+        """Rows of the best matches for `query`, ranked, from `offset` on"""
+        query = normalize_title(query)
+        if not query:
+            return []
+        wanted = offset + limit
+        matches = self._prefix_matches(query, PREFIX_SCAN * wanted)
+        if len(query) >= 3:
+            for row, score in self._fuzzy_matches(query, wanted).items():
+                matches.setdefault(row, score)
+        ranked = sorted(matches, key=lambda row: (-matches[row], len(self._normalized[row]), row))
+        # Duplicate titles resolve to the same movie, so list each title once
+        unique = {}
+        for row in ranked:
+            unique.setdefault(self._normalized[row], row)
+        return list(unique.values())[offset:wanted]
@@ -0,0 +1,317 @@
+"""Headless recommendation service: a small async HTTP/JSON server.
+
+One process keeps a warm Recommender in memory and serves any number of
+clients over keep-alive connections, so other services (and app.py, when
+RECOMMENDER_URL is set) don't need a Streamlit session per client. Finished
+results are kept in a ResultCache, and the artifact root is polled so a newly
+published version is loaded (and the cache invalidated) without a restart.
+
+Endpoints (all GET, JSON responses):
+    /health                                  {"status": "ok", "version": ..., "result_cache": {...}}
+    /titles                                  {"titles": [...]}
+    /search?q=...&limit=10&offset=0           {"results": [{"title": ..., "id": ...}, ...]}
+    /recommend?title=...&k=5&enrich=1         {"movie": {...}, "recommendations": [...], "errors": {...}}
+    /recommend_many?title=A&title=B&aggregate=mean|max|weighted&weight=2&weight=1&k=5
+                                             {"movies": [...], "recommendations": [...], "errors": {...}}
+    /sample?n=5&enrich=1                      {"movies": [...], "errors": {...}}
+    /rail?name=featured|trending&n=5          {"movies": [...], "errors": {...}}
+    /metrics                                 per-stage latency histograms, Prometheus text format
+
+Usage:
+    python service.py --host 127.0.0.1 --port 8600 --artifacts artifacts --result-cache 4096
+"""
+import argparse
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+from artifacts import DEFAULT_ARTIFACT_ROOT, current_version
+from engine import MovieNotFound, Recommender, default_tmdb_client
+from metrics import CONTENT_TYPE, render, span
+from neighbors import AGGREGATES, BACKENDS, check_weights
+from rails import RAILS
+from result_cache import POLICIES, ResultCache
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_BYTES = 16 * 1024
+
+
+class BadRequest(ValueError):
+    """Malformed query parameters"""
+
+
+def _int_param(query, name, default, low=1, high=100):
+    try:
+        value = int(query.get(name, [default])[0])
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer")
+    if not low <= value <= high:
+        raise BadRequest(f"{name} must be between {low} and {high}")
+    return value
+
+
+def _flag_param(query, name, default=True):
+    return query.get(name, ['1' if default else '0'])[0] not in ('0', 'false', 'no')
+
+
+class RecommendationService:
+    """Routes requests to a warm Recommender; blocking work runs on a thread pool"""
+
+    def __init__(self, recommender, max_workers=32, loader=None, root=DEFAULT_ARTIFACT_ROOT, reload_interval=30):
+        self.recommender = recommender
+        self.loader = loader  # loads a fresh Recommender when a new version is published
+        self.root = root
+        self.reload_interval = reload_interval
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='service')
+        self.routes = {
+            '/health': self.health,
+            '/titles': self.titles,
+            '/search': self.search,
+            '/recommend': self.recommend,
+            '/recommend_many': self.recommend_many,
+            '/sample': self.sample,
+            '/rail': self.rail,
+            '/metrics': self.metrics,
+        }
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(fn, *args, **kwargs))
+
+    async def health(self, query):
+        results = self.recommender.results
+        return {'status': 'ok', 'version': self.recommender.version, 'movies': len(self.recommender),
+                'result_cache': results.stats() if results is not None else None}
+
+    async def titles(self, query):
+        return {'titles': self.recommender.titles()}
+
+    async def search(self, query):
+        results = self.recommender.search(query.get('q', [''])[0], _int_param(query, 'limit', 10),
+                                          _int_param(query, 'offset', 0, low=0, high=1000))
+        return {'results': results}
+
+    async def recommend(self, query):
+        title = query.get('title', [''])[0]
+        if not title:
+            raise BadRequest("title is required")
+        k = _int_param(query, 'k', 5)
+        errors = {}
+        result = await self._run(self.recommender.recommend, title, k,
+                                 enrich=_flag_param(query, 'enrich'), errors=errors)
+        return {**result, 'errors': errors}
+
+    async def recommend_many(self, query):
+        titles = query.get('title', [])
+        if not titles:
+            raise BadRequest("at least one title is required")
+        aggregate = query.get('aggregate', ['mean'])[0]
+        if aggregate not in AGGREGATES:
+            raise BadRequest(f"aggregate must be one of {', '.join(AGGREGATES)}")
+        try:
+            weights = [float(weight) for weight in query['weight']] if 'weight' in query else None
+        except ValueError:
+            raise BadRequest("weight must be a number")
+        if weights is not None and len(weights) != len(titles):
+            raise BadRequest("give one weight per title")
+        if weights is not None and aggregate == 'weighted':
+            try:
+                check_weights(weights, len(titles))
+            except ValueError as e:
+                raise BadRequest(str(e))
+        errors = {}
+        result = await self._run(self.recommender.recommend_many, titles, _int_param(query, 'k', 5),
+                                 aggregate, weights, enrich=_flag_param(query, 'enrich'), errors=errors)
+        return {**result, 'errors': errors}
+
+    async def sample(self, query):
+        errors = {}
+        movies = await self._run(self.recommender.sample, _int_param(query, 'n', 5),
+                                 enrich=_flag_param(query, 'enrich'), errors=errors)
+        return {'movies': movies, 'errors': errors}
+
+    async def rail(self, query):
+        name = query.get('name', [''])[0]
+        if name not in RAILS:
+            raise BadRequest(f"name must be one of {', '.join(RAILS)}")
+        errors = {}
+        movies = await self._run(self.recommender.rail, name, _int_param(query, 'n', 5),
+                                 enrich=_flag_param(query, 'enrich'), errors=errors)
+        return {'movies': movies, 'errors': errors}
+
+    async def metrics(self, query):
+        return render()
+
+    async def dispatch(self, method, target):
+        """(status, payload) for one request"""
+        if method != 'GET':
+            return HTTPStatus.METHOD_NOT_ALLOWED, {'error': 'only GET is supported'}
+        url = urlsplit(target)
+        handler = self.routes.get(url.path)
+        if handler is None:
+            return HTTPStatus.NOT_FOUND, {'error': f'unknown path {url.path}'}
+        try:
+            with span(f'http:{url.path}'):
+                return HTTPStatus.OK, await handler(parse_qs(url.query))
+        except MovieNotFound as e:
+            return HTTPStatus.NOT_FOUND, {'error': f'movie not found: {e.args[0]}'}
+        except BadRequest as e:
+            return HTTPStatus.BAD_REQUEST, {'error': str(e)}
+        except Exception as e:
+            logger.exception("Error handling %s", target)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)}
+
+    async def handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one keep-alive connection"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ', 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+
+                status, payload = await self.dispatch(method, target)
+                if isinstance(payload, str):
+                    content_type, body = CONTENT_TYPE, payload.encode('utf-8')
+                else:
+                    content_type, body = 'application/json', json.dumps(payload).encode('utf-8')
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and version == 'HTTP/1.1')
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1')
+                    + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def watch_artifacts(self):
+        """Swap in a freshly loaded Recommender whenever CURRENT moves"""
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            version = current_version(self.root)
+            if version is None or version == self.recommender.version:
+                continue
+            try:
+                self.recommender = await self._run(self.loader)
+                logger.info("Reloaded artifacts: now serving version %s", self.recommender.version)
+            except Exception:
+                logger.exception("Could not load artifact version %s", version)
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+        logger.info("Serving %d movies (version %s) on http://%s:%d",
+                    len(self.recommender), self.recommender.version, host, port)
+        watcher = asyncio.create_task(self.watch_artifacts()) if self.loader and self.reload_interval > 0 else None
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+
+
+class RecommenderClient:
+    """HTTP client for the service with the same interface app.py uses in-process"""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()  # keep-alive to the service
+        self.version = self._get('/health')['version']
+
+    def _get(self, path, **params):
+        response = self.session.get(self.base_url + path, params=params, timeout=self.timeout)
+        if response.status_code == HTTPStatus.NOT_FOUND and path.startswith('/recommend'):
+            raise MovieNotFound(params.get('title'))
+        response.raise_for_status()
+        return response.json()
+
+    def titles(self):
+        return self._get('/titles')['titles']
+
+    def cache_stats(self):
+        return self._get('/health')['result_cache']
+
+    def search(self, query, limit=10, offset=0):
+        return self._get('/search', q=query, limit=limit, offset=offset)['results']
+
+    def recommend(self, title, k=5, enrich=True, errors=None):
+        result = self._get('/recommend', title=title, k=k, enrich=int(enrich))
+        if errors is not None:
+            errors.update(result.pop('errors', {}))
+        return result
+
+    def recommend_many(self, titles, k=5, aggregate='mean', weights=None, enrich=True, errors=None):
+        params = {'title': list(titles), 'k': k, 'aggregate': aggregate, 'enrich': int(enrich)}
+        if weights is not None:
+            params['weight'] = list(weights)
+        result = self._get('/recommend_many', **params)
+        if errors is not None:
+            errors.update(result.pop('errors', {}))
+        return result
+
+    def sample(self, n, enrich=True, errors=None):
+        result = self._get('/sample', n=n, enrich=int(enrich))
+        if errors is not None:
+            errors.update(result['errors'])
+        return result['movies']
+
+    def rail(self, name, n, enrich=True, errors=None):
+        result = self._get('/rail', name=name, n=n, enrich=int(enrich))
+        if errors is not None:
+            errors.update(result['errors'])
+        return result['movies']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recommendations over HTTP/JSON")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--artifacts', default=DEFAULT_ARTIFACT_ROOT, help="artifact root to serve")
+    parser.add_argument('--backend', default='exact', choices=BACKENDS, help="neighbor backend")
+    parser.add_argument('--n-probe', type=int, default=8, help="IVF lists scanned per query")
+    parser.add_argument('--workers', type=int, default=32, help="threads for enrichment calls")
+    parser.add_argument('--result-cache', type=int, default=4096, help="cached results (0 disables)")
+    parser.add_argument('--cache-policy', default='lru', choices=POLICIES, help="result cache eviction policy")
+    parser.add_argument('--reload-interval', type=float, default=30,
+                        help="seconds between checks for a newly published version (0 disables)")
+    parser.add_argument('--no-rerank', action='store_true',
+                        help="rank by content similarity only, ignoring the metadata features")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    results = ResultCache(args.result_cache, args.cache_policy) if args.result_cache > 0 else None
+    loader = partial(Recommender.load, args.artifacts, args.backend, args.n_probe,
+                     tmdb=default_tmdb_client(), results=results, rerank=not args.no_rerank)
+    service = RecommendationService(loader(), args.workers, loader, args.artifacts, args.reload_interval)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Local stand-in for the TMDB movie details API, for benchmarks and load tests.
+
+Serves deterministic details for any movie id with a configurable latency
+(plus optional jitter) and error rate, so runs are reproducible and never
+touch the real API:
+
+    with StubTMDB(latency=0.05) as stub:
+        client = TMDBClient('stub-token', movie_url=stub.movie_url)
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+GENRES = ['Action', 'Adventure', 'Comedy', 'Drama', 'Horror', 'Romance', 'Science Fiction', 'Thriller']
+
+
+def fake_movie(movie_id):
+    """TMDB-shaped details derived from the movie id"""
+    rng = random.Random(movie_id)
+    return {
+        'id': movie_id,
+        'title': f'Movie {movie_id}',
+        'overview': 'A synthetic movie served by the local TMDB stub.',
+        'genres': [{'name': name} for name in rng.sample(GENRES, 2)],
+        'vote_average': round(rng.uniform(1, 10), 1),
+        'vote_count': rng.randint(0, 20000),
+        'release_date': f'{rng.randint(1950, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+        'runtime': rng.randint(80, 180),
+        'tagline': '',
+        'imdb_id': f'tt{movie_id:07d}',
+        'poster_path': f'/poster{movie_id}.jpg',
+        'backdrop_path': f'/backdrop{movie_id}.jpg',
+    }
+
+
+class StubTMDB:
+    """Threaded HTTP server answering /3/movie/<id> like TMDB"""
+
+    def __init__(self, latency=0.05, error_rate=0.0, host='127.0.0.1', port=0, seed=0, jitter=0.0):
+        self.latency = latency
+        self.jitter = jitter  # up to this much extra latency, uniformly drawn per request
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def movie_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/3/movie/{{movie_id}}?language=en-US'
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                    failed = stub._rng.random() < stub.error_rate
+                    stub.errors += failed
+                    delay = stub.latency + stub._rng.uniform(0, stub.jitter)
+                time.sleep(delay)
+                try:
+                    movie_id = int(self.path.split('?')[0].rstrip('/').rsplit('/', 1)[-1])
+                except ValueError:
+                    movie_id = None
+                if failed or movie_id is None:
+                    status, payload = (503, {'status_message': 'stub error'}) if failed else (404, {})
+                else:
+                    status, payload = 200, fake_movie(movie_id)
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                if status == 200:
+                    self.send_header('ETag', f'"{movie_id}"')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,241 @@
+"""TMDB metadata client shared by every Streamlit session in the process.
+
+Details are fetched concurrently on a bounded thread pool. A client-side token
+bucket keeps us under the TMDB rate limit instead of fixed sleeps between
+calls, and in-flight requests are shared so two sessions asking for the same
+movie only cost one round trip. An optional MetadataCache persists results
+across processes and restarts.
+
+All requests go through one pooled keep-alive session with the auth headers
+set once. Retries use jittered exponential backoff, and stale cache entries are
+revalidated with If-None-Match / If-Modified-Since so an unchanged movie costs
+a 304 instead of a full payload.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import count, span
+
+logger = logging.getLogger(__name__)
+
+TMDB_MOVIE_URL = "https://api.themoviedb.org/3/movie/{movie_id}?language=en-US"
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def backoff_delay(attempt, base=0.5, cap=8.0):
+    """Exponential backoff with full jitter: uniform in [0, min(cap, base * 2**attempt)]"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def create_session(token, pool_size=16):
+    """Keep-alive session with a connection pool and the TMDB auth headers preset"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        "accept": "application/json",
+        "Authorization": f"Bearer {token}"
+    })
+    return session
+
+
+class TokenBucket:
+    """Rate limiter allowing `rate` calls per second with bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self._rate = float(rate)
+        self._capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a call is allowed"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
+
+
+def parse_movie_details(data):
+    """Turn a TMDB /movie payload into the dict the UI renders"""
+    # Get genres as comma-separated string
+    genres = ", ".join([genre['name'] for genre in data.get('genres', [])])
+
+    # Format release date
+    release_date = ""
+    if data.get('release_date'):
+        try:
+            date_obj = datetime.strptime(data['release_date'], '%Y-%m-%d')
+            release_date = date_obj.strftime('%b %d, %Y')
+        except ValueError:
+            release_date = data['release_date']
+
+    return {
+        'poster': f"https://image.tmdb.org/t/p/w500{data['poster_path']}" if data.get('poster_path') else None,
+        'backdrop': f"https://image.tmdb.org/t/p/original{data['backdrop_path']}" if data.get('backdrop_path') else None,
+        'title': data.get('title', ''),
+        'overview': data.get('overview', 'No overview available'),
+        'rating': round(data.get('vote_average', 0), 1),
+        'vote_count': data.get('vote_count', 0),
+        'release_date': release_date,
+        'year': data.get('release_date', '')[:4] if data.get('release_date') else 'N/A',
+        'runtime': f"{data.get('runtime', 0)} min" if data.get('runtime') else 'N/A',
+        'genres': genres,
+        'tagline': data.get('tagline', ''),
+        'imdb_id': data.get('imdb_id', '')
+    }
+
+
+class TMDBClient:
+    """Concurrent, rate-limited and memoized access to TMDB movie details.
+
+    Without a token the client runs offline: lookups are served from the
+    persistent cache when possible and otherwise return None, so callers fall
+    back to local catalog data.
+    """
+
+    def __init__(self, token, cache=None, max_workers=8, requests_per_second=20, burst=10,
+                 ttl=3600, connect_timeout=3.05, read_timeout=10, max_retries=3,
+                 backoff_base=0.5, pool_size=None, movie_url=TMDB_MOVIE_URL):
+        self.token = token
+        self.movie_url = movie_url  # overridden to point benchmarks at a local stub
+        self.cache = cache
+        self.ttl = ttl
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self._session = create_session(token, pool_size or max_workers)
+        self._limiter = TokenBucket(requests_per_second, burst)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tmdb')
+        self._cache = {}    # movie_id -> (expires_at, details)
+        self._pending = {}  # movie_id -> Future of an in-flight fetch
+        # Re-entrant: a fetch that finishes immediately runs its callback under the lock
+        self._lock = threading.RLock()
+
+    def _fetch(self, movie_id):
+        with span('metadata_cache'):
+            entry = self.cache.get_entry(movie_id) if self.cache is not None else None
+        if entry and entry['fresh']:
+            return entry['details']
+        if not self.token:
+            # Offline: a stale entry beats no details at all
+            return entry['details'] if entry else None
+
+        headers = {}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        url = self.movie_url.format(movie_id=movie_id)
+        for attempt in range(self.max_retries):
+            with span('tmdb_rate_limit'):
+                self._limiter.acquire()
+            try:
+                with span('tmdb_attempt'):
+                    response = self._session.get(url, headers=headers, timeout=self.timeout)
+                count('tmdb_responses_total', 'TMDB responses by status code', 'status', str(response.status_code))
+                if response.status_code == 304 and entry:
+                    self.cache.touch(movie_id)
+                    return entry['details']
+                response.raise_for_status()
+                details = parse_movie_details(response.json())
+                if self.cache is not None:
+                    self.cache.put(movie_id, details,
+                                   etag=response.headers.get('ETag'),
+                                   last_modified=response.headers.get('Last-Modified'))
+                return details
+            except requests.exceptions.RequestException as e:
+                status = e.response.status_code if e.response is not None else None
+                if status is None:
+                    count('tmdb_responses_total', 'TMDB responses by status code', 'status', 'error')
+                retryable = status is None or status in RETRYABLE_STATUS
+                if not retryable or attempt == self.max_retries - 1:
+                    raise
+                with span('tmdb_backoff'):
+                    time.sleep(backoff_delay(attempt, self.backoff_base))
+
+    def _finish(self, movie_id, future):
+        with self._lock:
+            self._pending.pop(movie_id, None)
+            if not future.exception() and future.result() is not None:
+                self._cache[movie_id] = (time.monotonic() + self.ttl, future.result())
+
+    def _load_from_cache(self, movie_ids):
+        """Pull ids missing from memory out of the persistent cache in one query"""
+        if self.cache is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            missing = [
+                movie_id for movie_id in map(int, movie_ids)
+                if movie_id not in self._pending and self._cache.get(movie_id, (0,))[0] <= now
+            ]
+        if not missing:
+            return
+        with span('metadata_cache'):
+            found = self.cache.get_many(missing)
+        with self._lock:
+            for movie_id, details in found.items():
+                self._cache[movie_id] = (now + self.ttl, details)
+
+    def _submit(self, movie_id):
+        movie_id = int(movie_id)
+        with self._lock:
+            cached = self._cache.get(movie_id)
+            if cached and cached[0] > time.monotonic():
+                future = Future()
+                future.set_result(cached[1])
+                return future
+            future = self._pending.get(movie_id)
+            if future is None:
+                # Run in a copy of the caller's context so the fetch spans land in its trace
+                future = self._executor.submit(contextvars.copy_context().run, self._fetch, movie_id)
+                self._pending[movie_id] = future
+                future.add_done_callback(lambda f: self._finish(movie_id, f))
+            return future
+
+    def prefetch(self, movie_ids):
+        """Start fetching details in the background without waiting"""
+        self._load_from_cache(movie_ids)
+        for movie_id in movie_ids:
+            self._submit(movie_id)
+
+    def details_many(self, movie_ids, errors=None):
+        """Details for every id, fetched concurrently, in input order.
+
+        Failed lookups come back as None; if `errors` is a dict it receives
+        movie_id -> error message for each failure.
+        """
+        self._load_from_cache(movie_ids)
+        futures = [self._submit(movie_id) for movie_id in movie_ids]
+        results = []
+        for movie_id, future in zip(movie_ids, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.warning("TMDB lookup failed for movie ID %s: %s", movie_id, e)
+                if errors is not None:
+                    errors[movie_id] = str(e)
+                results.append(None)
+        return results
+
+    def details(self, movie_id, errors=None):
+        """Details for a single movie, or None"""
+        return self.details_many([movie_id], errors=errors)[0]
@@ -0,0 +1,235 @@
+"""Incremental catalog updates on top of the published artifact version.
+
+Adds, updates or removes movies without refitting TF-IDF or rebuilding the
+whole neighbor index:
+
+* changed movies are vectorized with the version's fitted vocabulary and idf;
+* the changed rows, and every row whose neighbor list pointed at a removed or
+  updated movie (its reverse neighbors), are rescored against the catalog;
+* every other row only merges its current top-K with its scores against the
+  changed rows, which is exact because nothing else moved.
+
+The result is written as a new artifact version and published atomically.
+Terms that are not in the fitted vocabulary are ignored, so refit with
+`python pipeline.py` on a schedule; the manifest counts the updates applied
+since the last full fit.
+
+Usage:
+    python update.py --movies new_movies.csv --credits new_credits.csv --remove 19995 285
+"""
+import argparse
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+import artifacts
+from ann import _assign, save_ivf
+from catalog import load_catalog, save_catalog
+from embeddings import embed, save_embeddings
+from rerank import concat_features, encode_features, has_features, load_features, save_features, select_features
+from neighbors import NeighborIndex, load_neighbor_index, save_neighbor_index, top_k
+from pipeline import StageTimer, load_vocabulary, read_catalog, transform_tags
+
+
+def _rescore(vectors, vectors_t, rows, k, block_size):
+    """Exact top-k neighbors for the given rows, one row block at a time"""
+    ids = np.empty((len(rows), k), dtype=np.int32)
+    scores = np.empty((len(rows), k), dtype=np.float32)
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        block_scores = (vectors[block] @ vectors_t).toarray()
+        ids[start:start + len(block)], scores[start:start + len(block)] = top_k(block_scores, k, exclude=block)
+    return ids, scores
+
+
+def _merge(vectors, index, rows, changed, k, block_size):
+    """Current top-k of `rows` merged with their scores against the `changed` rows"""
+    changed_t = vectors[changed].T.tocsr()
+    ids = np.empty((len(rows), k), dtype=np.int32)
+    scores = np.empty((len(rows), k), dtype=np.float32)
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        candidate_ids = np.hstack([index.ids[block], np.broadcast_to(changed, (len(block), len(changed)))])
+        candidate_scores = np.hstack([index.scores[block], (vectors[block] @ changed_t).toarray()])
+        best, best_scores = top_k(candidate_scores, k)
+        ids[start:start + len(block)] = np.take_along_axis(candidate_ids, best, axis=1)
+        scores[start:start + len(block)] = best_scores
+    return ids, scores
+
+
+def apply_update(base_path, changes, remove_ids, block_size=1024, timer=None):
+    """Patched (catalog, vectors, NeighborIndex, ivf, features, stats) for one update.
+
+    ivf and features are None when the base version has none (or, for
+    features, when the changed movies come without metadata).
+    """
+    timer = timer or StageTimer(verbose=False)
+    if not os.path.exists(os.path.join(base_path, 'vocabulary.json')):
+        raise FileNotFoundError(f"{base_path} has no fitted vocabulary; it must be built by pipeline.py")
+
+    with timer.stage('load'):
+        catalog = load_catalog(base_path)
+        vectors = artifacts.load_csr(base_path, 'tfidf')
+        index = load_neighbor_index(base_path)
+        has_ivf = os.path.exists(os.path.join(base_path, 'ivf_centroids.npy'))
+        n, k = len(catalog), index.k
+
+    with timer.stage('vectorize'):
+        if len(changes):
+            delta = transform_tags(changes['tags'], load_vocabulary(base_path), artifacts.load_array(base_path, 'idf'))
+        else:
+            delta = sparse.csr_matrix((0, vectors.shape[1]), dtype=np.float32)
+
+    with timer.stage('layout'):
+        base_rows = pd.Series(np.arange(n), index=catalog['movie_id'].to_numpy())
+        remove_ids = set(int(movie_id) for movie_id in remove_ids)
+        conflicts = remove_ids.intersection(changes['movie_id'])
+        if conflicts:
+            raise ValueError(f"movies both changed and removed: {sorted(conflicts)}")
+        removed = base_rows.reindex(sorted(remove_ids)).dropna().to_numpy(dtype=np.int64)
+        changed_base = base_rows.reindex(changes['movie_id']).to_numpy()
+        is_update = ~np.isnan(changed_base)
+        updated = changed_base[is_update].astype(np.int64)
+
+        # New row order: surviving base rows in place (updated ones swapped for
+        # their new version), then added movies. `source` indexes into base + delta.
+        source = np.arange(n)
+        source[updated] = n + np.flatnonzero(is_update)
+        keep = np.ones(n, dtype=bool)
+        keep[removed] = False
+        source = np.concatenate([source[keep], n + np.flatnonzero(~is_update)])
+        old_to_new = np.full(n, -1, dtype=np.int64)
+        old_to_new[keep] = np.arange(int(keep.sum()))
+        if len(source) <= k:
+            raise ValueError(f"only {len(source)} movies left for k={k}; rebuild with pipeline.py")
+
+        new_catalog = pd.concat([catalog, changes[['movie_id', 'title']]], ignore_index=True)
+        new_catalog = new_catalog.iloc[source].reset_index(drop=True)
+        new_vectors = sparse.vstack([vectors, delta], format='csr', dtype=np.float32)[source]
+        features = None
+        if has_features(base_path) and ('genre_names' in changes or not len(changes)):
+            base_features = load_features(base_path)
+            if len(changes):
+                delta_features = encode_features(changes, base_features['genre_names'])
+            else:
+                delta_features = select_features(base_features, np.array([], dtype=np.int64))
+            features = select_features(concat_features(base_features, delta_features), source)
+
+        changed = np.concatenate([old_to_new[updated], np.arange(int(keep.sum()), len(source))])
+        # Reverse neighbors: rows that lose an entry can't be patched from their top-k alone
+        stale = np.isin(index.ids, np.concatenate([removed, updated])).any(axis=1) & keep
+        rescored = np.union1d(changed, old_to_new[stale]).astype(np.int64)
+        merged = np.setdiff1d(np.arange(len(source)), rescored)
+        # Surviving lists renumbered to the new rows (-1 entries only occur in rescored rows)
+        survivors = np.flatnonzero(keep)
+        old_index = NeighborIndex(np.empty((len(source), k), np.int32), np.empty((len(source), k), np.float32))
+        old_index.ids[old_to_new[survivors]] = old_to_new[index.ids[survivors]]
+        old_index.scores[old_to_new[survivors]] = index.scores[survivors]
+
+    ids = np.empty((len(source), k), dtype=np.int32)
+    scores = np.empty((len(source), k), dtype=np.float32)
+    with timer.stage('rescore'):
+        ids[rescored], scores[rescored] = _rescore(new_vectors, new_vectors.T.tocsr(), rescored, k, block_size)
+    with timer.stage('merge'):
+        if len(changed):
+            ids[merged], scores[merged] = _merge(new_vectors, old_index, merged, changed, k, block_size)
+        else:
+            ids[merged], scores[merged] = old_index.ids[merged], old_index.scores[merged]
+
+    ivf = None
+    if has_ivf:
+        with timer.stage('ivf'):
+            # Keep the trained centroids; only changed rows are (re)assigned
+            centroids = artifacts.load_array(base_path, 'ivf_centroids', mmap=False)
+            assignments = np.empty(len(source), dtype=np.int32)
+            assignments[old_to_new[survivors]] = artifacts.load_array(base_path, 'ivf_assignments')[survivors]
+            assignments[changed] = _assign(new_vectors[changed], centroids)
+            ivf = (centroids, assignments)
+
+    stats = {'added': int((~is_update).sum()), 'updated': len(updated), 'removed': len(removed),
+             'rescored': len(rescored), 'merged': len(merged) if len(changed) else 0}
+    return new_catalog, new_vectors, NeighborIndex(ids, scores), ivf, features, stats
+
+
+def run(movies_path=None, credits_path=None, remove_ids=(), root=artifacts.DEFAULT_ARTIFACT_ROOT,
+        block_size=1024, publish=True, verbose=True):
+    """Apply one incremental update to the published version; returns the new manifest"""
+    timer = StageTimer(verbose)
+    base_version = artifacts.current_version(root)
+    if base_version is None:
+        raise FileNotFoundError(f"No published artifacts in {root!r}; run `python pipeline.py` first")
+    base_path = artifacts.version_dir(root, base_version)
+    base_manifest = artifacts.read_manifest(base_path)
+
+    if movies_path:
+        changes = read_catalog(movies_path, credits_path, workers=1, timer=timer)
+    else:
+        changes = pd.DataFrame({'movie_id': pd.Series(dtype='int64'), 'title': [], 'tags': []})
+    catalog, vectors, index, ivf, features, stats = apply_update(base_path, changes, remove_ids, block_size, timer)
+
+    version = artifacts.new_version()
+    path = artifacts.version_dir(root, version)
+    with timer.stage('write'):
+        os.makedirs(path)
+        shutil.copyfile(os.path.join(base_path, 'vocabulary.json'), os.path.join(path, 'vocabulary.json'))
+        artifacts.save_array(path, 'idf', artifacts.load_array(base_path, 'idf'))
+        artifacts.save_csr(path, 'tfidf', vectors)
+        save_neighbor_index(index, path)
+        save_catalog(path, catalog)
+        if ivf is not None:
+            save_ivf(path, *ivf)
+        if features is not None:
+            save_features(path, features)
+        if os.path.exists(os.path.join(base_path, 'embedding_projection.npy')):
+            # Same projection as the fitted version; re-embedding is one sparse x dense product
+            projection = artifacts.load_array(base_path, 'embedding_projection', mmap=False)
+            save_embeddings(path, embed(vectors, projection), projection)
+
+    manifest = {
+        'version': version,
+        'movies': len(catalog),
+        'features': vectors.shape[1],
+        'k': index.k,
+        'params': base_manifest.get('params', {}),
+        'base_version': base_version,
+        'fitted_version': base_manifest.get('fitted_version', base_version),
+        'updates_since_fit': base_manifest.get('updates_since_fit', 0) + 1,
+        'update': stats,
+        'timings': timer.timings,
+    }
+    artifacts.write_manifest(path, manifest)
+    if publish:
+        artifacts.publish(root, version)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add, update or remove movies in the published artifacts")
+    parser.add_argument('--movies', help="movies.csv-format file with new or changed movies")
+    parser.add_argument('--credits', help="credits.csv-format file for the same movies")
+    parser.add_argument('--remove', type=int, nargs='+', default=[], help="TMDB ids to drop from the catalog")
+    parser.add_argument('--artifacts', default=artifacts.DEFAULT_ARTIFACT_ROOT, help="artifact root directory")
+    parser.add_argument('--block-size', type=int, default=1024, help="rows scored at a time")
+    parser.add_argument('--no-publish', action='store_true', help="build without switching CURRENT")
+    args = parser.parse_args()
+    if bool(args.movies) != bool(args.credits):
+        parser.error("--movies and --credits go together")
+    if not args.movies and not args.remove:
+        parser.error("nothing to do: pass --movies/--credits and/or --remove")
+
+    start = time.perf_counter()
+    manifest = run(args.movies, args.credits, args.remove, args.artifacts, args.block_size,
+                   publish=not args.no_publish)
+    update = manifest['update']
+    print(f"Built version {manifest['version']} from {manifest['base_version']}: "
+          f"+{update['added']} ~{update['updated']} -{update['removed']} movies, "
+          f"{update['rescored']} rows rescored in {time.perf_counter() - start:.1f}s "
+          f"({manifest['updates_since_fit']} updates since the last full fit)")
+
+
+if __name__ == '__main__':
+    main()
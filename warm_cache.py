@@ -0,0 +1,54 @@
+"""Offline pre-warm of the persistent TMDB metadata cache for the whole catalog.
+
+Usage:
+    TMDB_API_TOKEN=... python warm_cache.py --artifacts artifacts --cache tmdb_cache.sqlite
+"""
+import argparse
+import os
+import time
+
+from artifacts import DEFAULT_ARTIFACT_ROOT, current_version_dir
+from catalog import load_catalog
+from metadata_cache import DEFAULT_CACHE_PATH, MetadataCache
+from tmdb import TMDBClient
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill the TMDB metadata cache for every catalog movie")
+    parser.add_argument('--artifacts', default=DEFAULT_ARTIFACT_ROOT, help="artifact root whose current catalog is warmed")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help="SQLite cache file shared with app.py")
+    parser.add_argument('--token', default=os.environ.get('TMDB_API_TOKEN'), help="TMDB API read token")
+    parser.add_argument('--workers', type=int, default=8, help="concurrent TMDB requests")
+    parser.add_argument('--rate', type=float, default=20, help="TMDB requests per second")
+    parser.add_argument('--batch-size', type=int, default=500, help="movies per progress report")
+    args = parser.parse_args()
+
+    if not args.token:
+        parser.error("a TMDB token is required (--token or TMDB_API_TOKEN)")
+
+    path = current_version_dir(args.artifacts)
+    if path is None:
+        raise FileNotFoundError(f"No published artifacts in {args.artifacts!r}; run `python pipeline.py` first")
+
+    cache = MetadataCache(args.cache)
+    client = TMDBClient(args.token, cache=cache, max_workers=args.workers,
+                        requests_per_second=args.rate, burst=args.workers)
+    movie_ids = [int(movie_id) for movie_id in load_catalog(path)['movie_id']]
+
+    start = time.perf_counter()
+    failed = 0
+    for offset in range(0, len(movie_ids), args.batch_size):
+        batch = movie_ids[offset:offset + args.batch_size]
+        cached = cache.get_many(batch)
+        missing = [movie_id for movie_id in batch if movie_id not in cached]
+        errors = {}
+        client.details_many(missing, errors=errors)
+        failed += len(errors)
+        print(f"{min(offset + args.batch_size, len(movie_ids))}/{len(movie_ids)} movies, "
+              f"{len(missing)} fetched, {len(errors)} failed")
+
+    print(f"Done in {time.perf_counter() - start:.1f}s, {failed} failures, cache: {cache.stats()}")
+
+
+if __name__ == '__main__':
+    main()
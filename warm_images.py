@@ -0,0 +1,58 @@
+"""Bulk warm of the local poster/backdrop thumbnail cache for the whole catalog.
+
+Image URLs come from the TMDB metadata cache, so run warm_cache.py first.
+
+Usage:
+    python warm_images.py --artifacts artifacts --cache tmdb_cache.sqlite --images image_cache
+"""
+import argparse
+import time
+
+from artifacts import DEFAULT_ARTIFACT_ROOT, current_version_dir
+from catalog import load_catalog
+from images import DEFAULT_IMAGE_DIR, KIND_SIZES, ImageCache
+from metadata_cache import DEFAULT_CACHE_PATH, MetadataCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download and thumbnail posters/backdrops for every catalog movie")
+    parser.add_argument('--artifacts', default=DEFAULT_ARTIFACT_ROOT, help="artifact root whose current catalog is warmed")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help="SQLite metadata cache filled by warm_cache.py")
+    parser.add_argument('--images', default=DEFAULT_IMAGE_DIR, help="image cache directory")
+    parser.add_argument('--workers', type=int, default=16, help="concurrent image downloads")
+    parser.add_argument('--no-backdrops', action='store_true', help="only cache posters")
+    parser.add_argument('--batch-size', type=int, default=500, help="movies per progress report")
+    args = parser.parse_args()
+
+    path = current_version_dir(args.artifacts)
+    if path is None:
+        raise FileNotFoundError(f"No published artifacts in {args.artifacts!r}; run `python pipeline.py` first")
+
+    cache = MetadataCache(args.cache)
+    images = ImageCache(args.images, max_workers=args.workers)
+    kinds = ['poster'] if args.no_backdrops else list(KIND_SIZES)
+    movie_ids = [int(movie_id) for movie_id in load_catalog(path)['movie_id']]
+
+    start = time.perf_counter()
+    fetched = failed = unknown = 0
+    for offset in range(0, len(movie_ids), args.batch_size):
+        batch = movie_ids[offset:offset + args.batch_size]
+        # Image paths almost never change, so details past the metadata TTL still do
+        details = cache.get_many(batch, stale=True)
+        unknown += len(batch) - len(details)
+        todo = [
+            (movie[kind], kind) for movie in details.values() for kind in kinds
+            if movie.get(kind) and not all(images.cached(movie[kind], size) for size in KIND_SIZES[kind])
+        ]
+        errors = images.warm(todo)
+        fetched += len(todo) - len(errors)
+        failed += len(errors)
+        print(f"{min(offset + args.batch_size, len(movie_ids))}/{len(movie_ids)} movies, "
+              f"{len(todo)} images fetched, {len(errors)} failed")
+
+    print(f"Done in {time.perf_counter() - start:.1f}s: {fetched} images cached, {failed} failures, "
+          f"{unknown} movies without cached metadata (run warm_cache.py)")
+
+
+if __name__ == '__main__':
+    main()